@@ -0,0 +1,53 @@
+# run from the project root: python -m benchmarks.bench_image_encoding
+import time
+
+from PIL import Image
+
+from modules import note_image, image_encoder
+from modules.app_map import render_app_map
+from benchmarks.synthetic import make_journal, make_header
+
+settings = [
+    ("png", None),
+    ("png-fast", None),
+    ("png-palette", None),
+    ("jpeg", 75),
+    ("jpeg", 85),
+    ("webp", 75),
+    ("webp", 85),
+]
+
+
+def journal_pages(count=6):
+    # raw page images, before any encoding
+    notes = make_journal(200, cyrillic_ratio=0.2)
+    goals, focus = make_header()
+    hdr_h = note_image.header_height(goals, focus)
+    heights = [note_image.note_layout(n)["height"] for n in notes]
+    return [
+        note_image.draw_page(notes[start:end], content_h, goals, focus, first=(idx == 0))
+        for idx, (start, end, content_h) in enumerate(note_image.paginate(heights, hdr_h)[:count])
+    ]
+
+
+def main():
+    pages = journal_pages()
+    app_map = Image.open(render_app_map()).convert("RGB")
+    print(f"{len(pages)} journal pages, app map {app_map.size[0]}x{app_map.size[1]}")
+    print(f"  {'format':16} {'ms/page':>9} {'kb/page':>9} {'map ms':>8} {'map kb':>8}")
+
+    for name, q in settings:
+        label = f"{name} q{q}" if q else name
+        start = time.perf_counter()
+        sizes = [len(image_encoder.encode(p, "page", name=name, q=q).getvalue()) for p in pages]
+        page_ms = (time.perf_counter() - start) * 1000 / len(pages)
+
+        start = time.perf_counter()
+        map_size = len(image_encoder.encode(app_map, "map", name=name, q=q).getvalue())
+        map_ms = (time.perf_counter() - start) * 1000
+
+        print(f"  {label:16} {page_ms:9.1f} {sum(sizes) / len(sizes) / 1024:9.1f} {map_ms:8.1f} {map_size / 1024:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
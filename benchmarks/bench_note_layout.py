@@ -0,0 +1,41 @@
+# run from the project root: python -m benchmarks.bench_note_layout
+import time
+
+from modules import note_image
+from benchmarks.synthetic import make_journal, make_header
+
+
+def clear_caches():
+    note_image._layout_cache.clear()
+    note_image._cached_font.cache_clear()
+    note_image._avg_char_w.cache_clear()
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    notes = make_journal(500)
+    goals, focus = make_header()
+
+    clear_caches()
+    _, layout_cold = timed(lambda: [note_image.note_layout(n) for n in notes])
+    _, layout_warm = timed(lambda: [note_image.note_layout(n) for n in notes])
+
+    clear_caches()
+    pages, render_cold = timed(note_image.render_notes_page, notes, goals=goals, focus=focus)
+    _, render_warm = timed(note_image.render_notes_page, notes, goals=goals, focus=focus)
+
+    print(f"500 notes, {len(pages)} pages")
+    print(f"  layout, cold caches   {layout_cold:8.1f} ms")
+    print(f"  layout, warm caches   {layout_warm:8.1f} ms")
+    print(f"  full render, cold     {render_cold:8.1f} ms")
+    print(f"  full render, warm     {render_warm:8.1f} ms")
+    print(f"  fonts loaded          {note_image._cached_font.cache_info().currsize}")
+
+
+if __name__ == "__main__":
+    main()
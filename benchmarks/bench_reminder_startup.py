@@ -0,0 +1,120 @@
+# run from the project root: python -m benchmarks.bench_reminder_startup [--users 10000]
+#
+# schedules reminders for synthetic users the way post_init does at startup and
+# then reschedules a few users the way /schedule edits do. user files are kept
+# in memory so only scheduling is measured. "per_user" is the older layout of
+# two run_daily jobs per schedule entry plus a refresh job per user; "slots" is
+# the current one timer per UTC weekday and minute plus a single refresh sweep
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from telegram.ext import Application
+
+from modules import reminders, job_store
+from modules.helpers import time_se
+
+days = list(reminders.DAY_MAP)
+
+
+def make_users(count, seed=1):
+    rng = random.Random(seed)
+    users = {}
+    for i in range(count):
+        slots = rng.sample(days, rng.randint(0, 4))
+        users[100000 + i] = {
+            "schedule": [{"day": d, "time": f"{rng.choice([17, 18, 19])}:{rng.choice(['00', '30'])}"} for d in slots],
+            "goals": [],
+            "notes": [],
+        }
+    return users
+
+
+_per_user_jobs = {}
+
+
+async def _noop(context):
+    pass
+
+
+def per_user_schedule_all(job_queue, chat_id):
+    for job in _per_user_jobs.pop(chat_id, []):
+        job.schedule_removal()
+    jobs = _per_user_jobs[chat_id] = []
+    for entry in reminders.load_database(chat_id)["schedule"]:
+        day = reminders.DAY_MAP[entry["day"]]
+        hour, minute = (int(x) for x in entry["time"].split(":"))
+        for h in (hour - 1, hour + 1):
+            jobs.append(job_queue.run_daily(_noop, time=time_se(h, minute), days=(day,), chat_id=chat_id))
+    jobs.append(job_queue.run_daily(_noop, time=time_se(10, 0), days=(1,), chat_id=chat_id))
+
+
+def slots_schedule_all(job_queue, chat_id):
+    reminders.schedule_all_reminders(chat_id, job_queue)
+
+
+def reset():
+    _per_user_jobs.clear()
+    reminders._slots.clear()
+    reminders._timers.clear()
+    reminders._timer_jobs.clear()
+    reminders._slot_timer.clear()
+    reminders._user_slots.clear()
+    reminders._sweep_job = None
+    reminders._warm_job = None
+    # keep the bench away from the bot's own job store, but on disk so the
+    # cost of each commit is part of the measurement
+    job_store.close()
+    job_store.connect(Path(tempfile.mkdtemp()) / "jobs.sqlite3")
+
+
+async def run(users, schedule_all, edits=200):
+    reset()
+    app = Application.builder().token("123:bench").build()
+    job_queue = app.job_queue
+    # a running scheduler keeps jobs in its job store like the live bot does;
+    # paused so nothing fires during the run
+    job_queue.scheduler.start(paused=True)
+
+    # the first start seeds every user in one job store transaction
+    start = time.perf_counter()
+    with job_store.batch():
+        for chat_id in users:
+            schedule_all(job_queue, chat_id)
+    startup = time.perf_counter() - start
+
+    sample = random.Random(2).sample(list(users), min(edits, len(users)))
+    start = time.perf_counter()
+    for chat_id in sample:
+        schedule_all(job_queue, chat_id)
+    per_edit = (time.perf_counter() - start) / max(1, len(sample))
+    jobs = len(job_queue.jobs())
+    job_queue.scheduler.shutdown(wait=False)
+    return startup, per_edit, jobs
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+
+    users = make_users(args.users)
+    original_load = reminders.load_database
+    reminders.load_database = lambda chat_id: users[chat_id]
+    try:
+        for label, fn in (("per_user", per_user_schedule_all), ("slots", slots_schedule_all)):
+            startup, per_edit, jobs = asyncio.run(run(users, fn))
+            print(
+                f"{label:8} {len(users):6} users {jobs:7} jobs  "
+                f"startup {startup * 1000:9.1f} ms  reschedule one user {per_edit * 1000:8.3f} ms"
+            )
+    finally:
+        reminders.load_database = original_load
+        reset()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# run from the project root: python -m benchmarks.bench_render_pipeline [--out results.json]
+#
+# times each stage of turning a journal into page images, cold caches per run:
+# layout (wrapping and measuring every note), pagination (page bounds from the
+# heights), raster (drawing the pages) and encode (image bytes), plus the peak
+# python heap of the whole pipeline from tracemalloc. progress rows go to
+# stderr so stdout carries only the json report
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import PIL
+
+from modules import note_image, image_encoder
+from benchmarks.synthetic import make_journal, make_header
+
+default_sizes = (10, 100, 1000)
+
+# name -> make_journal ratios; "mixed" is the usual journal
+profiles = {
+    "mixed": {"cyrillic_ratio": 0.3, "long_ratio": 0.2, "technique_ratio": 0.4},
+    "latin_short": {"cyrillic_ratio": 0.0, "long_ratio": 0.0, "technique_ratio": 0.0},
+    "cyrillic_long": {"cyrillic_ratio": 1.0, "long_ratio": 0.8, "technique_ratio": 0.8},
+}
+
+
+def clear_caches():
+    note_image._layout_cache.clear()
+    note_image._cached_font.cache_clear()
+    note_image._avg_char_w.cache_clear()
+    note_image._background_tile.cache_clear()
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def run_pipeline(notes, goals, focus, fmt):
+    stages = {}
+
+    start = time.perf_counter()
+    heights = [note_image.note_layout(n)["height"] for n in notes]
+    stages["layout_ms"] = _ms(start)
+
+    start = time.perf_counter()
+    bounds = note_image.paginate(heights, note_image.header_height(goals, focus))
+    stages["paginate_ms"] = _ms(start)
+
+    start = time.perf_counter()
+    images = [
+        note_image.draw_page(notes[s:e], content_h, goals, focus, first=(idx == 0))
+        for idx, (s, e, content_h) in enumerate(bounds)
+    ]
+    stages["raster_ms"] = _ms(start)
+
+    start = time.perf_counter()
+    encoded = [image_encoder.encode(img, "training_notes", name=fmt) for img in images]
+    stages["encode_ms"] = _ms(start)
+
+    stages["pages"] = len(bounds)
+    stages["bytes"] = sum(len(b.getvalue()) for b in encoded)
+    return stages
+
+
+def bench(count, profile, fmt, repeat):
+    notes = make_journal(count, **profiles[profile])
+    goals, focus = make_header()
+
+    runs = []
+    for _ in range(repeat):
+        clear_caches()
+        runs.append(run_pipeline(notes, goals, focus, fmt))
+
+    # peak heap in a separate cold run so tracing does not skew the timings
+    clear_caches()
+    tracemalloc.start()
+    run_pipeline(notes, goals, focus, fmt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = {k: min(r[k] for r in runs) for k in ("layout_ms", "paginate_ms", "raster_ms", "encode_ms")}
+    best["total_ms"] = round(sum(best.values()), 2)
+    return {
+        "notes": count,
+        "profile": profile,
+        "format": fmt,
+        "pages": runs[0]["pages"],
+        "bytes": runs[0]["bytes"],
+        "peak_kb": round(peak / 1024, 1),
+        **best,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(str(s) for s in default_sizes))
+    parser.add_argument("--profiles", default=",".join(profiles))
+    parser.add_argument("--format", default=image_encoder.format_name(), choices=sorted(image_encoder.formats))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write json results here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for profile in args.profiles.split(","):
+        for count in (int(s) for s in args.sizes.split(",")):
+            row = bench(count, profile, args.format, args.repeat)
+            results.append(row)
+            print(
+                f"{profile:14} {count:5} notes {row['pages']:4} pages  "
+                f"layout {row['layout_ms']:8.1f}  paginate {row['paginate_ms']:6.2f}  "
+                f"raster {row['raster_ms']:8.1f}  encode {row['encode_ms']:8.1f} ms  "
+                f"peak {row['peak_kb']:8.0f} kb",
+                file=sys.stderr,
+                flush=True,
+            )
+
+    report = {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "layout_version": note_image.LAYOUT_VERSION,
+        "render_version": note_image.RENDER_VERSION,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# run from the project root: python -m benchmarks.bench_technique_detector
+#
+# "substring" is the old scan: fast, but it matches inside words ("mount" in
+# "mountain") and only knows the common terms. the automaton keeps pace with it
+# on note-sized input and falls behind on very long text, where walking every
+# word in python costs more than the substring search in C
+import random
+import re
+import time
+
+from modules.technique_detector import common_terms, detect_techniques, patterns, _goto, _out
+
+filler = (
+    "drilled with my partner today and the coach showed details about posture "
+    "grips and timing, felt tired after the mountain run but rolled five rounds "
+    "super upbeat class, need to keep elbows tight and breathe"
+).split()
+
+
+def naive_detect(text):
+    lower = text.lower()
+    return [t.title() for t in common_terms if t in lower]
+
+
+def _pattern_texts():
+    # walk the automaton to recover every pattern phrase it was built from
+    texts = []
+    stack = [(0, [])]
+    while stack:
+        state, words = stack.pop()
+        for word, nxt in _goto[state].items():
+            stack.append((nxt, words + [word]))
+        if any(patterns[pid][0] == len(words) for pid in _out[state]):
+            texts.append(" ".join(words))
+    return texts
+
+
+_boundary_res = None
+
+
+def naive_boundary_detect(text):
+    # same pattern set and word boundaries as the automaton, one regex per pattern
+    global _boundary_res
+    if _boundary_res is None:
+        _boundary_res = [re.compile(r"\b" + re.escape(t) + r"s?\b") for t in _pattern_texts()]
+    lower = " ".join(re.findall(r"[a-z0-9\u0400-\u04ff]+", text.lower()))
+    return [r.pattern for r in _boundary_res if r.search(lower)]
+
+
+def make_note(words, rng):
+    out = []
+    for _ in range(words):
+        if rng.random() < 0.05:
+            out.append(rng.choice(common_terms))
+        else:
+            out.append(rng.choice(filler))
+    return " ".join(out)
+
+
+def bench(fn, notes, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for n in notes:
+            fn(n)
+    return (time.perf_counter() - start) / (rounds * len(notes)) * 1000
+
+
+def main():
+    print(f"{len(patterns)} patterns")
+    rng = random.Random(7)
+    for words in (20, 200, 2000):
+        notes = [make_note(words, rng) for _ in range(50)]
+        rounds = max(1, 2000 // words)
+        naive_ms = bench(naive_detect, notes, rounds)
+        boundary_ms = bench(naive_boundary_detect, notes, rounds)
+        ac_ms = bench(detect_techniques, notes, rounds)
+        print(
+            f"{words:>5} words  substring {naive_ms:.3f}  "
+            f"regex per pattern {boundary_ms:.3f}  automaton {ac_ms:.3f}  (ms/note)"
+        )
+
+    sample = "felt upbeat after the mountain run, then rnc from back control and some armbars"
+    print()
+    print("sample:", sample)
+    print("  naive:    ", naive_detect(sample))
+    print("  automaton:", [t["label"] for t in detect_techniques(sample)])
+
+
+if __name__ == "__main__":
+    main()
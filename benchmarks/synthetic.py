@@ -0,0 +1,57 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+latin_words = (
+    "drilled guard pass sweep armbar partner timing posture tired rolled rounds "
+    "coach showed grips frames hips elbows tight breathe pressure escape mount "
+    "side control knee slice triangle kimura positional sparring felt good"
+).split()
+
+cyrillic_words = (
+    "тренировка гард проход свип рычаг партнер тайминг осанка устал раунды "
+    "тренер захваты бедра локти дыхание давление побег маунт треугольник кимура"
+).split()
+
+techniques = ["Armbar", "Triangle Choke", "Kimura", "Knee Cut", "Scissor Sweep", "Mount"]
+
+
+def make_note(rng, when, words, cyrillic=False, with_techniques=False):
+    vocab = cyrillic_words if cyrillic else latin_words
+    text = " ".join(rng.choice(vocab) for _ in range(words))
+    if words > 60 and rng.random() < 0.5:
+        text += "\n\n" + " ".join(rng.choice(vocab) for _ in range(words // 3))
+    return {
+        "id": uuid.UUID(int=rng.getrandbits(128)).hex[:8],
+        "date": when.strftime("%Y-%m-%d"),
+        "time": when.strftime("%H:%M"),
+        "day": when.strftime("%A"),
+        "text": text,
+        "techniques": rng.sample(techniques, rng.randint(1, 3)) if with_techniques else [],
+        "created_at": when.isoformat(),
+    }
+
+
+def make_journal(count, seed=1, cyrillic_ratio=0.2, long_ratio=0.2, technique_ratio=0.4):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 6, 19, 30)
+    notes = []
+    for i in range(count):
+        words = rng.randint(60, 200) if rng.random() < long_ratio else rng.randint(3, 25)
+        notes.append(make_note(
+            rng,
+            start + timedelta(days=i * 2),
+            words,
+            cyrillic=rng.random() < cyrillic_ratio,
+            with_techniques=rng.random() < technique_ratio,
+        ))
+    return notes
+
+
+def make_header():
+    goals = [
+        {"goals": "keep elbows tight", "status": "active"},
+        {"goals": "attempt one sweep per roll", "status": "active"},
+    ]
+    focus = {"technique": "scissor sweep"}
+    return goals, focus
@@ -17,6 +17,8 @@ from modules.commands_menu import (
     help_command,
     menu_callback,
     menucmd_callback,
+    send_app_map,
+    prepare_app_map,
 )
 from modules.commands_info import (
     mindset_command,
@@ -56,7 +58,7 @@ from modules.commands_drills import (
     focus_callback,
     stats_command,
 )
-from modules.commands_schedule import schedule_command, schedule_callback
+from modules.commands_schedule import schedule_command, schedule_callback, timezone_command
 from modules.commands_export import (
     export_command,
     export_callback,
@@ -64,10 +66,16 @@ from modules.commands_export import (
     import_receive_file,
     state_import_waiting,
 )
-from modules.reminders import setup_reminders, schedule_all_reminders
-from modules.commands_reminders import reminders_command, reminder_toggle_callback
-from modules.app_map import render_app_map
+from modules.reminders import setup_reminders, restore_reminders, slot_summary, reminder_kinds
+from modules.commands_reminders import reminders_command, reminder_toggle_callback, checkin_callback
+from modules import app_map
+from modules import page_cache
+from modules import render_service
+from modules import dispatcher
+from modules import job_store
+from modules import scheduler_metrics
 from modules.ai_chat import handle_chat_message
+from modules.commands_admin import aistats_command, sendstats_command, jobstats_command
 
 load_dotenv()
 
@@ -75,39 +83,48 @@ logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     level=logging.INFO,
 )
+logger = logging.getLogger(__name__)
+
+
+bot_commands = [
+    BotCommand("note", "log a training note"),
+    BotCommand("notes", "view my notes"),
+    BotCommand("journal", "edit or delete notes"),
+    BotCommand("goal", "set a goal"),
+    BotCommand("goals", "view my goals"),
+    BotCommand("focus", "current technique focus"),
+    BotCommand("technique", "browse techniques"),
+    BotCommand("schedule", "training schedule"),
+    BotCommand("stats", "my progress"),
+    BotCommand("help", "open menu"),
+]
 
 
 async def map_command(update, context):
-    img_buf = render_app_map()
-    await update.message.reply_photo(
-        photo=img_buf,
-        caption="here's how the bot is organized. tap /help to open the menu.",
-    )
+    await send_app_map(update.message)
 
 
 async def post_init(application):
-    await application.bot.set_my_commands([
-        BotCommand("note", "log a training note"),
-        BotCommand("notes", "view my notes"),
-        BotCommand("journal", "edit or delete notes"),
-        BotCommand("goal", "set a goal"),
-        BotCommand("goals", "view my goals"),
-        BotCommand("focus", "current technique focus"),
-        BotCommand("technique", "browse techniques"),
-        BotCommand("schedule", "training schedule"),
-        BotCommand("stats", "my progress"),
-        BotCommand("help", "open menu"),
-    ])
-
-    from pathlib import Path
-    data_dir = Path(__file__).parent / "data"
-    if data_dir.exists():
-        for f in data_dir.glob("user_*.json"):
-            try:
-                chat_id = int(f.stem.replace("user_", ""))
-                schedule_all_reminders(chat_id, application.job_queue)
-            except (ValueError, Exception):
-                pass
+    await application.bot.set_my_commands(bot_commands)
+
+    render_service.start()
+    app_map.configure(application, bot_commands, reminder_kinds())
+    try:
+        await prepare_app_map()
+    except Exception:
+        # only a warm-up, /map renders on demand if this fails
+        logger.exception("could not prerender the app map")
+
+    scheduler_metrics.install(application.job_queue, slot_summary)
+    restore_reminders(application.job_queue)
+    await scheduler_metrics.start_server()
+
+
+async def post_shutdown(application):
+    render_service.shutdown()
+    page_cache.flush()
+    job_store.close()
+    await scheduler_metrics.stop_server()
 
 
 def main():
@@ -118,7 +135,14 @@ def main():
         print("get one from @BotFather on Telegram")
         return
 
-    app = Application.builder().token(token).post_init(post_init).build()
+    app = (
+        Application.builder()
+        .token(token)
+        .rate_limiter(dispatcher.limiter)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     cmd_fallback = MessageHandler(filters.COMMAND, cancel_command)
 
@@ -190,18 +214,23 @@ def main():
     app.add_handler(CommandHandler("stats", stats_command))
     app.add_handler(CommandHandler("toolbox", toolbox_command))
     app.add_handler(CommandHandler("schedule", schedule_command))
+    app.add_handler(CommandHandler("timezone", timezone_command))
     app.add_handler(CommandHandler("export", export_command))
     app.add_handler(CommandHandler("reminders", reminders_command))
     app.add_handler(CommandHandler("map", map_command))
+    app.add_handler(CommandHandler("aistats", aistats_command))
+    app.add_handler(CommandHandler("sendstats", sendstats_command))
+    app.add_handler(CommandHandler("jobstats", jobstats_command))
 
     app.add_handler(CallbackQueryHandler(menu_callback, pattern="^menu_"))
     app.add_handler(CallbackQueryHandler(menucmd_callback, pattern="^menucmd_"))
     app.add_handler(CallbackQueryHandler(goal_action_callback, pattern="^goal_"))
     app.add_handler(CallbackQueryHandler(note_goal_callback, pattern="^notegoal_"))
-    app.add_handler(CallbackQueryHandler(notes_page_callback, pattern="^notespage_"))
+    app.add_handler(CallbackQueryHandler(notes_page_callback, pattern="^notes(page|album)_"))
     app.add_handler(CallbackQueryHandler(note_manage_callback, pattern="^notedel_"))
     app.add_handler(CallbackQueryHandler(note_manage_callback, pattern="^notemanage_"))
     app.add_handler(CallbackQueryHandler(reminder_toggle_callback, pattern="^rem_toggle_"))
+    app.add_handler(CallbackQueryHandler(checkin_callback, pattern="^checkin_"))
     app.add_handler(CallbackQueryHandler(schedule_callback, pattern="^sched_"))
     app.add_handler(CallbackQueryHandler(export_callback, pattern="^export_"))
     app.add_handler(CallbackQueryHandler(focus_callback, pattern="^focus_"))
@@ -13,6 +13,7 @@ from .database import load_database, save_database, data_directory
 from .ai_tools import action_tools, tool_executors
 from .ai_tools import exec_get_notes, exec_get_goals, exec_get_schedule, exec_get_focus, exec_get_stats
 from .ai_guards import is_off_topic, clean_response
+from .ai_telemetry import start_request, timed_send, finish_request
 from .helpers import now_se
 
 logger = logging.getLogger(__name__)
@@ -166,7 +167,7 @@ def execute_tool(chat_id, part):
     return name, executor(chat_id, args) if executor else "Tool not available."
 
 
-async def run_tool_loop(chat, chat_id, response, max_rounds=5):
+async def run_tool_loop(chat, chat_id, response, max_rounds=5, telemetry=None):
     urls = []
     done = set()
     called = set()
@@ -186,6 +187,10 @@ async def run_tool_loop(chat, chat_id, response, max_rounds=5):
         if not new_parts:
             break
 
+        if telemetry is not None:
+            telemetry["rounds"] += 1
+            telemetry["tool_calls"] += len(new_parts)
+
         resp_parts = []
         for fp in new_parts:
             name, result = execute_tool(chat_id, fp)
@@ -199,7 +204,7 @@ async def run_tool_loop(chat, chat_id, response, max_rounds=5):
             resp_parts.append(types.Part.from_function_response(name=name, response={"result": str(result)}))
 
         try:
-            response = chat.send_message(resp_parts)
+            response = timed_send(chat, resp_parts, telemetry)
         except Exception as err:
             logger.warning(f"tool loop send failed: {err}")
             break
@@ -291,17 +296,22 @@ async def handle_chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     last_error = None
     delay = 1.0
+    telemetry = start_request(chat_id, is_voice)
 
     for model in MODEL_CANDIDATES:
         for attempt in range(3):
+            telemetry["model"] = model
+            telemetry["attempts"] += 1
             try:
                 if chat_session and used_model == model and attempt == 0:
                     chat = chat_session
                 else:
                     chat = client.chats.create(model=model, config=config, history=load_history(chat_id))
 
-                response = chat.send_message(parts)
-                response, collected_urls, called_tools = await run_tool_loop(chat, chat_id, response)
+                response = timed_send(chat, parts, telemetry)
+                response, collected_urls, called_tools = await run_tool_loop(
+                    chat, chat_id, response, telemetry=telemetry,
+                )
 
                 reply = ""
                 for p in response.candidates[0].content.parts:
@@ -326,6 +336,7 @@ async def handle_chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 if remaining <= 3:
                     reply += f"\n\n({remaining} ai messages left today)"
                 await update.message.reply_text(reply)
+                finish_request(telemetry, ok=True)
                 return
 
             except Exception as err:
@@ -350,6 +361,7 @@ async def handle_chat_message(update: Update, context: ContextTypes.DEFAULT_TYPE
                 break
 
     user_sessions.pop(chat_id, None)
+    finish_request(telemetry, ok=False)
     es = str(last_error).lower() if last_error else ""
     logger.error(f"Gemini API error for {chat_id}: {last_error}")
 
@@ -0,0 +1,179 @@
+import json
+import time
+import logging
+from collections import deque
+from datetime import timedelta
+
+from .database import data_directory
+from .helpers import now_se, percentile
+
+logger = logging.getLogger(__name__)
+
+telemetry_file = data_directory / "ai_telemetry.jsonl"
+max_records = 5000
+
+# usd per 1M tokens: (prompt, response)
+model_prices = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash-lite-001": (0.075, 0.30),
+}
+
+_records = None
+
+
+def _load_records():
+    global _records
+    if _records is not None:
+        return _records
+    _records = deque(maxlen=max_records)
+    if telemetry_file.exists():
+        with open(telemetry_file, "r") as f:
+            for line in f:
+                try:
+                    _records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return _records
+
+
+def _persist(record, records):
+    with open(telemetry_file, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    # the file is append only; compact it once it grows well past the window
+    if telemetry_file.stat().st_size > max_records * 600:
+        with open(telemetry_file, "w") as f:
+            for r in records:
+                f.write(json.dumps(r) + "\n")
+
+
+def start_request(chat_id, is_voice=False):
+    return {
+        "chat_id": chat_id,
+        "voice": is_voice,
+        "started": time.perf_counter(),
+        "model": None,
+        "attempts": 0,
+        "tool_calls": 0,
+        "rounds": 0,
+        "prompt_tokens": 0,
+        "candidate_tokens": 0,
+        # model -> [prompt, response] tokens, so a request that fell back to
+        # another model is priced per attempt
+        "model_tokens": {},
+        "model_s": 0.0,
+    }
+
+
+def timed_send(chat, parts, telemetry=None):
+    t0 = time.perf_counter()
+    try:
+        response = chat.send_message(parts)
+    finally:
+        if telemetry is not None:
+            telemetry["model_s"] += time.perf_counter() - t0
+    if telemetry is not None:
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            prompt = usage.prompt_token_count or 0
+            candidate = usage.candidates_token_count or 0
+            telemetry["prompt_tokens"] += prompt
+            telemetry["candidate_tokens"] += candidate
+            tokens = telemetry["model_tokens"].setdefault(telemetry["model"] or "", [0, 0])
+            tokens[0] += prompt
+            tokens[1] += candidate
+    return response
+
+
+def _price(model, prompt_tokens, candidate_tokens):
+    prompt_price, response_price = model_prices.get(model or "", (0.0, 0.0))
+    return (prompt_tokens * prompt_price + candidate_tokens * response_price) / 1_000_000
+
+
+def request_cost(record):
+    by_model = record.get("model_tokens")
+    if by_model is None:
+        # records from before per-model tokens were kept
+        return _price(record.get("model"), record.get("prompt_tokens", 0), record.get("candidate_tokens", 0))
+    return sum(_price(model, p, c) for model, (p, c) in by_model.items())
+
+
+def finish_request(telemetry, ok):
+    wall = time.perf_counter() - telemetry["started"]
+    model_s = telemetry["model_s"]
+    record = {
+        "ts": now_se().isoformat(timespec="seconds"),
+        "chat_id": telemetry["chat_id"],
+        "voice": telemetry["voice"],
+        "ok": ok,
+        "model": telemetry["model"],
+        "attempts": telemetry["attempts"],
+        "tool_calls": telemetry["tool_calls"],
+        "rounds": telemetry["rounds"],
+        "prompt_tokens": telemetry["prompt_tokens"],
+        "candidate_tokens": telemetry["candidate_tokens"],
+        "model_tokens": telemetry["model_tokens"],
+        "wall_s": round(wall, 3),
+        "model_s": round(model_s, 3),
+        "local_s": round(max(0.0, wall - model_s), 3),
+    }
+    records = _load_records()
+    records.append(record)
+    try:
+        _persist(record, records)
+    except OSError as err:
+        logger.warning(f"could not write ai telemetry: {err}")
+    return record
+
+
+def _pcts(values, fmt="{:.2f}"):
+    return "  ".join(f"p{p} {fmt.format(percentile(values, p))}" for p in (50, 90, 99))
+
+
+def build_report(days=7):
+    since = (now_se() - timedelta(days=days)).isoformat(timespec="seconds")
+    recent = [r for r in _load_records() if r.get("ts", "") >= since]
+    if not recent:
+        return f"no ai requests in the last {days} days."
+
+    ok = [r for r in recent if r.get("ok")]
+    lines = [f"ai stats, last {days} days: {len(recent)} requests, {len(recent) - len(ok)} failed", ""]
+
+    lines.append("latency (s)")
+    lines.append("  wall   " + _pcts([r["wall_s"] for r in recent]))
+    lines.append("  model  " + _pcts([r["model_s"] for r in recent]))
+    lines.append("  local  " + _pcts([r["local_s"] for r in recent]))
+    lines.append("")
+
+    lines.append("tokens per request")
+    lines.append("  prompt   " + _pcts([r["prompt_tokens"] for r in ok], "{:.0f}"))
+    lines.append("  response " + _pcts([r["candidate_tokens"] for r in ok], "{:.0f}"))
+    lines.append("")
+
+    lines.append("tool loop")
+    lines.append("  calls   " + _pcts([r["tool_calls"] for r in ok], "{:.0f}"))
+    lines.append("  rounds  " + _pcts([r["rounds"] for r in ok], "{:.0f}"))
+    lines.append("  attempts " + _pcts([r["attempts"] for r in recent], "{:.0f}"))
+    lines.append("")
+
+    by_model = {}
+    for r in ok:
+        by_model[r["model"]] = by_model.get(r["model"], 0) + 1
+    lines.append("models")
+    for model, count in sorted(by_model.items(), key=lambda x: -x[1]):
+        lines.append(f"  {model}: {count}")
+    lines.append("")
+
+    by_day = {}
+    for r in recent:
+        day = r["ts"][:10]
+        cost, count = by_day.get(day, (0.0, 0))
+        by_day[day] = (cost + request_cost(r), count + 1)
+    lines.append("daily cost (usd)")
+    for day in sorted(by_day):
+        cost, count = by_day[day]
+        lines.append(f"  {day}  ${cost:.4f}  ({count} req)")
+    total = sum(c for c, _ in by_day.values())
+    lines.append(f"  total  ${total:.4f}")
+
+    return "\n".join(lines)
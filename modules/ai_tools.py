@@ -1,8 +1,11 @@
 import uuid
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from .database import load_database, save_database
 from .techniques_data import all_techniques
+from . import technique_index
+from . import user_stats
+from .toolbox import add_technique, refresh, toolbox_entries
 from .helpers import now_se
 
 
@@ -148,7 +151,7 @@ def exec_get_focus(chat_id, _args):
     parts = []
     drill = db.get("active_drill")
     parts.append(f"Current focus: {drill['technique']}" if drill else "No focus technique set.")
-    toolbox = db.get("toolbox", [])
+    toolbox = toolbox_entries(db)
     if toolbox:
         names = [t["name"] for t in toolbox[:20]]
         parts.append(f"Toolbox ({len(toolbox)} techniques): " + ", ".join(names))
@@ -160,23 +163,13 @@ def exec_get_focus(chat_id, _args):
 
 def exec_get_stats(chat_id, _args):
     db = load_database(chat_id)
-    total_notes = len(db.get("notes", []))
-    log = db.get("training_log", [])
-    trained = sum(1 for e in log if e.get("trained"))
-    seven_ago = (now_se() - timedelta(days=7)).strftime("%Y-%m-%d")
-    week_count = sum(1 for e in log if e.get("trained") and e["date"] >= seven_ago)
-    active_goals = sum(1 for g in db.get("goals", []) if g.get("status") == "active")
-    done_goals = sum(1 for g in db.get("goals", []) if g.get("status") == "completed")
-
-    streak = 0
-    current = now_se().date()
-    dates = sorted([e["date"] for e in log if e.get("trained")], reverse=True)
-    for ds in dates:
-        if datetime.strptime(ds, "%Y-%m-%d").date() == current:
-            streak += 1
-            current -= timedelta(days=1)
-        else:
-            break
+    stats = user_stats.summary(db, now_se().strftime("%Y-%m-%d"))
+    week_count = stats["trained_week"]
+    trained = stats["trained"]
+    streak = stats["streak"]
+    total_notes = stats["notes"]
+    active_goals = stats["active_goals"]
+    done_goals = stats["completed_goals"]
 
     return (
         f"Sessions this week: {week_count}. Total trained: {trained} days. "
@@ -191,19 +184,7 @@ def exec_search_technique(_chat_id, args):
     if not query:
         return "No technique name provided."
 
-    matches = []
-    for ck, cat in all_techniques.items():
-        for tk, tech in cat.get("items", {}).items():
-            name = tech.get("name", "").lower()
-            if query in name or query in tk:
-                matches.append((ck, tk, tech))
-
-    if not matches:
-        for ck, cat in all_techniques.items():
-            for tk, tech in cat.get("items", {}).items():
-                name = tech.get("name", "").lower()
-                if any(w in name or w in tk for w in query.split()):
-                    matches.append((ck, tk, tech))
+    matches = technique_index.search(query, limit=10)
 
     if not matches:
         return (
@@ -215,7 +196,7 @@ def exec_search_technique(_chat_id, args):
         )
 
     results = []
-    for ck, tk, tech in matches[:10]:
+    for _, ck, tk, tech in matches:
         line = f"TECHNIQUE: {tech.get('name', '')}\nKEY: {ck}:{tk}\nDESCRIPTION: {tech.get('description', '')}"
         video = tech.get("video_url", "")
         if video:
@@ -238,12 +219,8 @@ def exec_list_techniques(_chat_id, args):
         lines.append("\nCOMMAND: /technique to browse all techniques")
         return "Available categories:\n" + "\n".join(lines)
 
-    cat = all_techniques.get(category)
-    if not cat:
-        for k, v in all_techniques.items():
-            if category in k or category in v.get("name", "").lower():
-                cat = v
-                break
+    cat_id = technique_index.resolve_category(category)
+    cat = all_techniques.get(cat_id) if cat_id else None
     if not cat:
         return f"No category '{category}' found. Available: escapes, submissions, sweeps, guardpasses, takedowns, positions, ukemi, selfdefense."
 
@@ -260,42 +237,11 @@ def exec_list_techniques(_chat_id, args):
 
 
 def _find_by_key(key):
-    if ":" not in key:
-        return None
-    cat_id, tech_id = key.split(":", 1)
-    cat_id, tech_id = cat_id.strip(), tech_id.strip()
-    cat = all_techniques.get(cat_id)
-    if not cat:
-        for k, v in all_techniques.items():
-            if cat_id in k or cat_id in v.get("name", "").lower():
-                cat, cat_id = v, k
-                break
-    if not cat:
-        return None
-    tech = cat.get("items", {}).get(tech_id)
-    if not tech:
-        for tk, tv in cat.get("items", {}).items():
-            if tech_id in tk or tech_id in tv.get("name", "").lower():
-                tech, tech_id = tv, tk
-                break
-    if not tech:
-        return None
-    return cat_id, tech_id, tech
+    return technique_index.lookup_key(key)
 
 
 def _find_by_name(query):
-    q = query.lower().strip()
-    for ck, cat in all_techniques.items():
-        for tk, tech in cat.get("items", {}).items():
-            name = tech.get("name", "").lower()
-            if q in name or q in tk:
-                return ck, tk, tech
-    for ck, cat in all_techniques.items():
-        for tk, tech in cat.get("items", {}).items():
-            name = tech.get("name", "").lower()
-            if any(w in name or w in tk for w in q.split()):
-                return ck, tk, tech
-    return None
+    return technique_index.resolve(query)
 
 
 def exec_set_focus(chat_id, args):
@@ -349,6 +295,7 @@ def exec_add_goal(chat_id, args):
         "refresh_schedule": [],
         "refresh_index": 0,
     })
+    user_stats.goal_changed(db, None, "active")
     save_database(chat_id, db)
     return f"Goal saved: \"{text}\" ({active + 1}/3 slots used).\nCOMMAND: /goals to manage goals"
 
@@ -385,18 +332,10 @@ def exec_add_to_toolbox(chat_id, args):
     cat_id, tech_id, tech = found
     full_key = f"{cat_id}:{tech_id}"
     db = load_database(chat_id)
-    toolbox = db.get("toolbox", [])
-    for e in toolbox:
-        if e["key"] == full_key:
-            return f"'{tech['name']}' is already in the toolbox.\nCOMMAND: /toolbox to view known techniques"
-    toolbox.append({
-        "key": full_key,
-        "name": tech["name"],
-        "category": all_techniques[cat_id]["name"],
-        "added_at": now_se().isoformat(),
-    })
-    db["toolbox"] = toolbox
+    if not add_technique(db, full_key):
+        return f"'{tech['name']}' is already in the toolbox.\nCOMMAND: /toolbox to view known techniques"
     save_database(chat_id, db)
+    refresh(chat_id, db)
     return f"'{tech['name']}' added to the toolbox.\nCOMMAND: /toolbox to view known techniques"
 
 
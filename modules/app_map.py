@@ -1,7 +1,13 @@
-import io
+import json
+import hashlib
+from functools import lru_cache
 
 from PIL import Image, ImageDraw, ImageFont
 from pathlib import Path
+from telegram.ext import CommandHandler, ConversationHandler
+
+from . import image_encoder
+from .menu_sections import menu_sections
 
 min_map_w = 900
 box_h = 36
@@ -22,46 +28,69 @@ sub_col = (80, 100, 160)
 
 fonts_dir = Path(__file__).parent.parent / "fonts"
 
-app_tree = {
-    "bjj training bot": {
-        "my training": [
-            "write a note  /note",
-            "view my notes  /notes",
-            "set a goal (max 3)  /goal",
-            "view my goals  /goals",
-            "current focus  /focus",
-            "my progress  /stats",
-        ],
-        "learn": [
-            "technique library  /technique",
-            "my toolbox  /toolbox",
-        ],
-        "bjj knowledge": [
-            "mindset  /mindset",
-            "training habits  /habits",
-            "mat etiquette  /etiquette",
-            "what to do  /dos",
-            "what not to do  /donts",
-            "competition scoring  /scoring",
-            "illegal moves  /illegal",
-        ],
-        "settings": [
-            "training schedule  /schedule",
-            "reminder time  /reminders",
-            "export my data  /export",
-            "import backup  /import",
-            "app map  /map",
-            "developer link",
-        ],
-        "automatic reminders": [
-            "daily check in (did you train?)",
-            "pretraining recap (1h before)",
-            "weekly goal reminder (Monday)",
-            "daily focus reminder",
-            "spaced repetition refreshes",
-        ],
-    }
-}
+title = "bjj training bot"
+
+
+def registered_commands(application):
+    # every command name a handler answers to, including conversation entry points
+    found = set()
+
+    def walk(handler):
+        if isinstance(handler, CommandHandler):
+            found.update(handler.commands)
+        elif isinstance(handler, ConversationHandler):
+            for h in handler.entry_points + handler.fallbacks:
+                walk(h)
+            for handlers in handler.states.values():
+                for h in handlers:
+                    walk(h)
+
+    for handlers in application.handlers.values():
+        for h in handlers:
+            walk(h)
+    return found
+
+
+def build_tree(commands, bot_commands=(), reminder_kinds=()):
+    # menu sections with the commands that are actually registered, then any
+    # public bot command the menu does not show, then the reminder kinds the
+    # scheduler sends
+    sections = []
+    for sec in menu_sections:
+        items = []
+        for label, cmd in sec["items"]:
+            if cmd is None:
+                items.append(f"{label} link")
+            elif cmd in commands:
+                items.append(f"{label}  /{cmd}")
+        if items:
+            sections.append((sec["title"], items))
+
+    in_menu = {cmd for sec in menu_sections for _, cmd in sec["items"]}
+    extra = [
+        f"{c.description}  /{c.command}"
+        for c in bot_commands
+        if c.command in commands and c.command not in in_menu
+    ]
+    if extra:
+        sections.append(("more commands", extra))
+    if reminder_kinds:
+        sections.append(("automatic reminders", list(reminder_kinds)))
+    return sections
+
+
+# replaced at startup by configure(); until then every menu command is assumed
+app_tree = build_tree({cmd for sec in menu_sections for _, cmd in sec["items"]})
+
+
+def configure(application, bot_commands, reminder_kinds=()):
+    global app_tree
+    app_tree = build_tree(registered_commands(application), bot_commands, reminder_kinds)
+
+
+def map_key(tree=None):
+    raw = json.dumps([title, tree or app_tree, image_encoder.signature()], ensure_ascii=False)
+    return "map-" + hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
 
 
 def text_size(draw, text, font):
@@ -69,6 +98,7 @@ def text_size(draw, text, font):
     return bbox[2] - bbox[0], bbox[3] - bbox[1]
 
 
+@lru_cache(maxsize=8)
 def load_font(size):
     font_path = fonts_dir / "CaveatBrush-Regular.ttf"
     if font_path.exists():
@@ -85,12 +115,12 @@ def load_font(size):
     return ImageFont.load_default(size=size)
 
 
-def render_app_map():
+def render_app_map(tree=None):
     font_title = load_font(32)
     font_section = load_font(24)
     font_item = load_font(20)
 
-    sections = list(app_tree["bjj training bot"].items())
+    sections = tree or app_tree
 
     tmp_img = Image.new("RGB", (1, 1))
     tmp_draw = ImageDraw.Draw(tmp_img)
@@ -119,7 +149,6 @@ def render_app_map():
     img = Image.new("RGB", (map_w, map_h), bg)
     draw = ImageDraw.Draw(img)
 
-    title = "bjj training bot"
     tw, th = text_size(draw, title, font_title)
     title_x = (map_w - tw) // 2
     title_y = 20
@@ -177,8 +206,4 @@ def render_app_map():
 
         x_cursor += col_w + col_gap
 
-    output = io.BytesIO()
-    img.save(output, format="PNG", optimize=True)
-    output.seek(0)
-    output.name = "app_map.png"
-    return output
+    return image_encoder.encode(img, "app_map")
@@ -0,0 +1,47 @@
+import os
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from .ai_telemetry import build_report
+from . import dispatcher
+from . import scheduler_metrics
+
+
+def admin_ids():
+    raw = os.getenv("ADMIN_CHAT_IDS", "")
+    ids = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if part.lstrip("-").isdigit():
+            ids.add(int(part))
+    return ids
+
+
+def is_admin(chat_id):
+    return chat_id in admin_ids()
+
+
+async def aistats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_chat.id):
+        return
+
+    days = 7
+    if context.args:
+        try:
+            days = max(1, min(int(context.args[0]), 90))
+        except ValueError:
+            pass
+
+    await update.message.reply_text(f"```\n{build_report(days)}\n```", parse_mode="Markdown")
+
+
+async def sendstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_chat.id):
+        return
+    await update.message.reply_text(f"```\n{dispatcher.build_report()}\n```", parse_mode="Markdown")
+
+
+async def jobstats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_chat.id):
+        return
+    await update.message.reply_text(f"```\n{scheduler_metrics.build_report()}\n```", parse_mode="Markdown")
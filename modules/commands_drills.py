@@ -1,10 +1,11 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from .database import load_database, save_database
-from .techniques_data import all_techniques
 from .helpers import now_se
+from .toolbox import add_technique, refresh, toolbox_count, total_techniques
+from . import user_stats
 
 
 async def focus_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -61,22 +62,9 @@ async def focus_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.edit_message_text("no active focus to move.")
             return
 
-        toolbox = database.get("toolbox", [])
         key = active_drill.get("toolbox_key", "")
-        already_in = False
         if key:
-            for entry in toolbox:
-                if entry["key"] == key:
-                    already_in = True
-                    break
-
-        if key and not already_in:
-            toolbox.append({
-                "key": key,
-                "name": active_drill["technique"],
-                "category": active_drill.get("category", ""),
-                "added_at": now_se().isoformat(),
-            })
+            add_technique(database, key)
 
         database["drill_queue"].append({
             "technique": active_drill["technique"],
@@ -86,6 +74,7 @@ async def focus_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         database["active_drill"] = None
         save_database(chat_id, database)
+        refresh(chat_id, database)
 
         await query.edit_message_text(
             f"✓ *{active_drill['technique']}* moved to your toolbox!\n\n"
@@ -115,19 +104,8 @@ async def focus_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    chat_id = update.effective_chat.id
-    database = load_database(chat_id)
-
-    total_notes = len(database["notes"])
-
-    active_goals = 0
-    completed_goals = 0
-    for g in database["goals"]:
-        if g.get("status", "active") == "active":
-            active_goals += 1
-        elif g.get("status") == "completed":
-            completed_goals += 1
+def build_stats_message(database):
+    stats = user_stats.summary(database, now_se().strftime("%Y-%m-%d"))
 
     active_drill = database.get("active_drill")
     if active_drill:
@@ -135,76 +113,24 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         focus_text = "none"
 
-    first_date = "n/a"
-    this_week_notes = 0
-    if database["notes"]:
-        all_dates = set()
-        for note in database["notes"]:
-            all_dates.add(note["date"])
-        first_date = sorted(all_dates)[0]
-
-        seven_days_ago = (now_se() - timedelta(days=7)).strftime("%Y-%m-%d")
-        for note in database["notes"]:
-            if note["date"] >= seven_days_ago:
-                this_week_notes += 1
-
-    training_log = database.get("training_log", [])
-    total_checkins = len(training_log)
-    days_trained = 0
-    for entry in training_log:
-        if entry["trained"]:
-            days_trained += 1
-    days_rest = total_checkins - days_trained
-
-    seven_days_ago_str = (now_se() - timedelta(days=7)).strftime("%Y-%m-%d")
-    thirty_days_ago_str = (now_se() - timedelta(days=30)).strftime("%Y-%m-%d")
-    week_trained = 0
-    month_trained = 0
-    for entry in training_log:
-        if entry["trained"] and entry["date"] >= seven_days_ago_str:
-            week_trained += 1
-        if entry["trained"] and entry["date"] >= thirty_days_ago_str:
-            month_trained += 1
-
-    streak = 0
-    current = now_se().date()
-    trained_dates = []
-    for entry in training_log:
-        if entry["trained"]:
-            trained_dates.append(entry["date"])
-    trained_dates.sort(reverse=True)
-    for date_str in trained_dates:
-        log_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        if log_date == current:
-            streak += 1
-            current = current - timedelta(days=1)
-        else:
-            break
-
-    toolbox = database.get("toolbox", [])
-    total_techniques = 0
-    for cat in all_techniques.values():
-        total_techniques += len(cat["items"])
-    toolbox_count = len(toolbox)
-
     message = (
         "*training stats*\n\n"
         "*activity:*\n"
-        f"  this week: *{week_trained}* sessions\n"
-        f"  this month: *{month_trained}* sessions\n"
-        f"  total trained: *{days_trained}* days\n"
-        f"  rest days: *{days_rest}*\n"
+        f"  this week: *{stats['trained_week']}* sessions\n"
+        f"  this month: *{stats['trained_month']}* sessions\n"
+        f"  total trained: *{stats['trained']}* days\n"
+        f"  rest days: *{stats['rest']}*\n"
     )
 
-    if streak > 0:
-        message += f"  🔥 streak: *{streak}* days\n"
+    if stats["streak"] > 0:
+        message += f"  🔥 streak: *{stats['streak']}* days\n"
 
     message += (
         f"\n*progress:*\n"
         f"  focus: *{focus_text}*\n"
-        f"  goals: *{active_goals}* active, *{completed_goals}* completed\n"
-        f"  toolbox: *{toolbox_count}/{total_techniques}* techniques\n"
-        f"  notes: *{total_notes}* total, *{this_week_notes}* this week\n"
+        f"  goals: *{stats['active_goals']}* active, *{stats['completed_goals']}* completed\n"
+        f"  toolbox: *{toolbox_count(database)}/{total_techniques()}* techniques\n"
+        f"  notes: *{stats['notes']}* total, *{stats['notes_week']}* this week\n"
     )
 
     drill_history = database.get("drill_queue", [])
@@ -215,7 +141,13 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if drill_history:
         message += f"  past focuses: *{len(drill_history)}* ({learned} moved to toolbox)\n"
 
-    if database["notes"]:
-        message += f"\n_training since {first_date}_"
+    if stats["first_note"]:
+        message += f"\n_training since {stats['first_note']}_"
+    return message
+
 
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    database = load_database(chat_id)
+    message = build_stats_message(database)
     await update.message.reply_text(message, parse_mode="Markdown")
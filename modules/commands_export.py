@@ -5,6 +5,11 @@ from telegram.ext import ContextTypes, ConversationHandler
 
 from .database import load_database, save_database
 from .helpers import now_se
+from .toolbox import forget, toolbox_count, toolbox_entries, toolbox_mask
+from .notes_pages import reset as reset_note_pages
+from . import user_stats
+from . import refresh_index
+from .reminders import schedule_all_reminders
 
 state_import_waiting = "IMPORT_WAITING_FILE"
 
@@ -123,15 +128,23 @@ async def import_receive_file(update: Update, context: ContextTypes.DEFAULT_TYPE
         "drill_queue": [],
         "active_drill": None,
         "training_log": [],
-        "toolbox": [],
         "schedule": [],
     }
     for key, default_val in defaults.items():
         if key not in data:
             data[key] = default_val
+    # converts a legacy toolbox list from older backups into the bitset
+    toolbox_mask(data)
+    # page boundaries are rebuilt from the imported notes on the next /notes
+    reset_note_pages(data)
+    user_stats.rebuild(data)
 
     chat_id = update.effective_chat.id
     save_database(chat_id, data)
+    forget(chat_id)
+    refresh_index.index_user(chat_id, data)
+    # the job store only learns about schedule changes through here
+    schedule_all_reminders(chat_id, context.application.job_queue)
 
     summary_parts = []
     notes_count = len(data.get("notes", []))
@@ -140,9 +153,9 @@ async def import_receive_file(update: Update, context: ContextTypes.DEFAULT_TYPE
     goals_count = len(data.get("goals", []))
     if goals_count:
         summary_parts.append(f"{goals_count} goals")
-    toolbox_count = len(data.get("toolbox", []))
-    if toolbox_count:
-        summary_parts.append(f"{toolbox_count} techniques in toolbox")
+    known_count = toolbox_count(data)
+    if known_count:
+        summary_parts.append(f"{known_count} techniques in toolbox")
     log_count = len(data.get("training_log", []))
     if log_count:
         summary_parts.append(f"{log_count} training log entries")
@@ -277,7 +290,7 @@ def build_txt_export(db):
             lines.append(f"  ...and {len(training_log) - 30} more")
         lines.append("")
 
-    toolbox = db.get("toolbox", [])
+    toolbox = toolbox_entries(db)
     if toolbox:
         lines.append(f"TOOLBOX ({len(toolbox)} techniques you know)")
         lines.append("")
@@ -5,6 +5,8 @@ from telegram.ext import ContextTypes, ConversationHandler
 
 from .database import load_database, save_database
 from .helpers import get_current_week, now_se
+from . import refresh_index
+from . import user_stats
 
 state_goal_setting = 1
 
@@ -95,6 +97,7 @@ async def goal_receive_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     }
 
     database["goals"].append(new_goal)
+    user_stats.goal_changed(database, None, "active")
     save_database(chat_id, database)
 
     active_count = count_active_goals(database)
@@ -178,7 +181,9 @@ async def goal_action_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             await query.edit_message_text("goal not found.")
             return
 
+        old_status = goal.get("status", "active")
         goal["status"] = "completed"
+        user_stats.goal_changed(database, old_status, "completed")
         goal["completed_at"] = now_se().isoformat()
 
         goal["refresh_schedule"] = []
@@ -188,6 +193,7 @@ async def goal_action_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             goal["refresh_schedule"].append(remind_date)
 
         save_database(chat_id, database)
+        refresh_index.track_goal(chat_id, goal)
 
         date_1m = (now_se() + timedelta(days=refresh_intervals[0])).strftime("%b %d")
         date_2m = (now_se() + timedelta(days=refresh_intervals[1])).strftime("%b %d")
@@ -212,8 +218,11 @@ async def goal_action_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             await query.edit_message_text("goal not found.")
             return
 
+        old_status = goal.get("status", "active")
         goal["status"] = "removed"
+        user_stats.goal_changed(database, old_status, "removed")
         save_database(chat_id, database)
+        refresh_index.track_goal(chat_id, goal)
 
         await query.edit_message_text(f"removed: _{goal['goals']}_", parse_mode="Markdown")
 
@@ -226,6 +235,7 @@ async def goal_action_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 
         goal["refresh_index"] = goal.get("refresh_index", 0) + 1
         save_database(chat_id, database)
+        refresh_index.track_goal(chat_id, goal)
 
         remaining = len(goal.get("refresh_schedule", [])) - goal["refresh_index"]
         if remaining > 0:
@@ -1,23 +1,56 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from .techniques_data import all_techniques
 from .database import load_database
-from .commands_techniques import toolbox_key, get_toolbox
-from .app_map import render_app_map
+from .commands_techniques import category_keyboard
+from .toolbox import known_mask, toolbox_entries, total_techniques
+from . import app_map
+from . import page_cache
+from . import render_service
+from .menu_sections import menu_sections, sections_by_key, developer_url
 from .helpers import now_se
 
 
 def main_menu_keyboard():
     return InlineKeyboardMarkup([
-        [InlineKeyboardButton("📝 my training", callback_data="menu_training")],
-        [InlineKeyboardButton("📚 learn", callback_data="menu_learn")],
-        [InlineKeyboardButton("🥋 bjj knowledge", callback_data="menu_knowledge")],
-        [InlineKeyboardButton("⚙️ settings", callback_data="menu_settings")],
+        [InlineKeyboardButton(f"{sec['emoji']} {sec['title']}", callback_data=f"menu_{sec['key']}")]
+        for sec in menu_sections
     ])
 
 
+def section_keyboard(section):
+    rows = []
+    for label, cmd in section["items"]:
+        if cmd is None:
+            rows.append([InlineKeyboardButton(label, url=developer_url)])
+        else:
+            rows.append([InlineKeyboardButton(label, callback_data=f"menucmd_{cmd}")])
+    rows.append([InlineKeyboardButton("« back", callback_data="menu_main")])
+    return InlineKeyboardMarkup(rows)
+
+
+def _map_renderer(tree):
+    return lambda: render_service.run(app_map.render_app_map, tree)
+
+
+async def prepare_app_map():
+    # render once at startup so the first /map is already a cached send
+    tree = app_map.app_tree
+    await page_cache.cached_or_render(app_map.map_key(tree), _map_renderer(tree), stem="app_map")
+
+
+async def send_app_map(target):
+    tree = app_map.app_tree
+    try:
+        await page_cache.reply_cached(
+            target, app_map.map_key(tree), _map_renderer(tree), stem="app_map",
+            caption="here's how the bot is organized. tap /help to open the menu.",
+        )
+    except render_service.RenderBusy:
+        await target.reply_text("the map is busy being drawn, please try again in a moment.")
+
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     welcome_message = (
         "*bjj training bot*\n\n"
@@ -49,70 +82,12 @@ async def menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=main_menu_keyboard(),
         )
 
-    elif data == "menu_training":
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("write a note", callback_data="menucmd_note")],
-            [InlineKeyboardButton("view my notes", callback_data="menucmd_notes")],
-            [InlineKeyboardButton("manage notes", callback_data="menucmd_journal")],
-            [InlineKeyboardButton("set a goal (max 3)", callback_data="menucmd_goal")],
-            [InlineKeyboardButton("view my goals", callback_data="menucmd_goals")],
-            [InlineKeyboardButton("current focus", callback_data="menucmd_focus")],
-            [InlineKeyboardButton("my progress", callback_data="menucmd_stats")],
-            [InlineKeyboardButton("« back", callback_data="menu_main")],
-        ])
-        await query.edit_message_text(
-            "*📝 my training*\n\n"
-            "track your sessions, goals, and progress.",
-            parse_mode="Markdown",
-            reply_markup=keyboard,
-        )
-
-    elif data == "menu_learn":
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("technique library", callback_data="menucmd_technique")],
-            [InlineKeyboardButton("my toolbox", callback_data="menucmd_toolbox")],
-            [InlineKeyboardButton("« back", callback_data="menu_main")],
-        ])
-        await query.edit_message_text(
-            "*📚 learn*\n\n"
-            "browse techniques and track what you know.",
-            parse_mode="Markdown",
-            reply_markup=keyboard,
-        )
-
-    elif data == "menu_knowledge":
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("mindset", callback_data="menucmd_mindset")],
-            [InlineKeyboardButton("training habits", callback_data="menucmd_habits")],
-            [InlineKeyboardButton("mat etiquette", callback_data="menucmd_etiquette")],
-            [InlineKeyboardButton("what to do", callback_data="menucmd_dos")],
-            [InlineKeyboardButton("what not to do", callback_data="menucmd_donts")],
-            [InlineKeyboardButton("competition scoring", callback_data="menucmd_scoring")],
-            [InlineKeyboardButton("illegal moves", callback_data="menucmd_illegal")],
-            [InlineKeyboardButton("« back", callback_data="menu_main")],
-        ])
-        await query.edit_message_text(
-            "*🥋 bjj knowledge*\n\n"
-            "tips, rules, and etiquette for the mats.",
-            parse_mode="Markdown",
-            reply_markup=keyboard,
-        )
-
-    elif data == "menu_settings":
-        keyboard = InlineKeyboardMarkup([
-            [InlineKeyboardButton("training schedule", callback_data="menucmd_schedule")],
-            [InlineKeyboardButton("reminders", callback_data="menucmd_reminders")],
-            [InlineKeyboardButton("export my data", callback_data="menucmd_export")],
-            [InlineKeyboardButton("import backup", callback_data="menucmd_import")],
-            [InlineKeyboardButton("app map", callback_data="menucmd_map")],
-            [InlineKeyboardButton("developer", url="https://www.linkedin.com/in/marialagerholm/")],
-            [InlineKeyboardButton("« back", callback_data="menu_main")],
-        ])
+    elif data.replace("menu_", "") in sections_by_key:
+        section = sections_by_key[data.replace("menu_", "")]
         await query.edit_message_text(
-            "*⚙️ settings*\n\n"
-            "manage your schedule, reminders, and data.",
+            f"*{section['emoji']} {section['title']}*\n\n{section['blurb']}",
             parse_mode="Markdown",
-            reply_markup=keyboard,
+            reply_markup=section_keyboard(section),
         )
 
 
@@ -232,30 +207,16 @@ async def dispatch_menu_command(cmd, query, context):
         return
 
     if cmd == "technique":
-        db = load_database(chat_id)
-        toolbox_set = get_toolbox(db)
-        keyboard = []
-        for cat_id, cat_data in all_techniques.items():
-            total = len(cat_data["items"])
-            known = 0
-            for tech_id in cat_data["items"]:
-                if toolbox_key(cat_id, tech_id) in toolbox_set:
-                    known += 1
-            label = cat_data["name"]
-            if known > 0:
-                label += f" ({known}/{total} ✓)"
-            keyboard.append([InlineKeyboardButton(label, callback_data=f"techcat_{cat_id}")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
         await query.message.reply_text(
             "*techniques library*\n\nchoose a category:",
             parse_mode="Markdown",
-            reply_markup=reply_markup,
+            reply_markup=category_keyboard(known_mask(chat_id)),
         )
         return
 
     if cmd == "toolbox":
         db = load_database(chat_id)
-        toolbox = db.get("toolbox", [])
+        toolbox = toolbox_entries(db)
         if not toolbox:
             await query.message.reply_text(
                 "*your toolbox*\n\nempty! browse /technique and mark the ones you know.",
@@ -268,9 +229,7 @@ async def dispatch_menu_command(cmd, query, context):
             if cat not in by_category:
                 by_category[cat] = []
             by_category[cat].append(entry["name"])
-        total_available = 0
-        for cat in all_techniques.values():
-            total_available += len(cat["items"])
+        total_available = total_techniques()
         total_known = len(toolbox)
         message = f"*your toolbox* ({total_known}/{total_available})\n\n"
         for cat_name, techs in by_category.items():
@@ -376,132 +335,23 @@ async def dispatch_menu_command(cmd, query, context):
         return
 
     if cmd == "stats":
+        from .commands_drills import build_stats_message
         db = load_database(chat_id)
-        total_notes = len(db.get("notes", []))
-        active_goals = 0
-        completed_goals = 0
-        for g in db.get("goals", []):
-            if g.get("status", "active") == "active":
-                active_goals += 1
-            elif g.get("status") == "completed":
-                completed_goals += 1
-        active_drill = db.get("active_drill")
-        if active_drill:
-            focus_text = active_drill["technique"]
-        else:
-            focus_text = "none"
-        notes = db.get("notes", [])
-        first_date = "n/a"
-        this_week_notes = 0
-        if notes:
-            all_dates = set()
-            for n in notes:
-                all_dates.add(n["date"])
-            first_date = sorted(all_dates)[0]
-            seven_ago = (now_se() - timedelta(days=7)).strftime("%Y-%m-%d")
-            for n in notes:
-                if n["date"] >= seven_ago:
-                    this_week_notes += 1
-        training_log = db.get("training_log", [])
-        days_trained = 0
-        for e in training_log:
-            if e["trained"]:
-                days_trained += 1
-        days_rest = len(training_log) - days_trained
-        seven_ago_str = (now_se() - timedelta(days=7)).strftime("%Y-%m-%d")
-        thirty_ago_str = (now_se() - timedelta(days=30)).strftime("%Y-%m-%d")
-        week_trained = 0
-        month_trained = 0
-        for e in training_log:
-            if e["trained"] and e["date"] >= seven_ago_str:
-                week_trained += 1
-            if e["trained"] and e["date"] >= thirty_ago_str:
-                month_trained += 1
-        streak = 0
-        current = now_se().date()
-        trained_dates = []
-        for e in training_log:
-            if e["trained"]:
-                trained_dates.append(e["date"])
-        trained_dates.sort(reverse=True)
-        for d in trained_dates:
-            if datetime.strptime(d, "%Y-%m-%d").date() == current:
-                streak += 1
-                current = current - timedelta(days=1)
-            else:
-                break
-        toolbox = db.get("toolbox", [])
-        total_techniques = 0
-        for cat in all_techniques.values():
-            total_techniques += len(cat["items"])
-        message = (
-            "*training stats*\n\n"
-            "*activity:*\n"
-            f"  this week: *{week_trained}* sessions\n"
-            f"  this month: *{month_trained}* sessions\n"
-            f"  total trained: *{days_trained}* days\n"
-            f"  rest days: *{days_rest}*\n"
-        )
-        if streak > 0:
-            message += f"  🔥 streak: *{streak}* days\n"
-        message += (
-            f"\n*progress:*\n"
-            f"  focus: *{focus_text}*\n"
-            f"  goals: *{active_goals}* active, *{completed_goals}* completed\n"
-            f"  toolbox: *{len(toolbox)}/{total_techniques}* techniques\n"
-            f"  notes: *{total_notes}* total, *{this_week_notes}* this week\n"
-        )
-        drill_history = db.get("drill_queue", [])
-        learned = 0
-        for d in drill_history:
-            if d.get("outcome") == "toolbox":
-                learned += 1
-        if drill_history:
-            message += f"  past focuses: *{len(drill_history)}* ({learned} moved to toolbox)\n"
-        if notes:
-            message += f"\n_training since {first_date}_"
-        await query.message.reply_text(message, parse_mode="Markdown")
+        await query.message.reply_text(build_stats_message(db), parse_mode="Markdown")
         return
 
     if cmd == "reminders":
+        from .commands_reminders import build_reminders_message
         db = load_database(chat_id)
-        schedule = db.get("schedule", [])
-        disabled = db.get("reminders_disabled", False)
-
-        if not schedule:
-            await query.message.reply_text(
-                "no training schedule set yet. use /schedule first, "
-                "reminders are created automatically from your schedule."
-            )
+        message, reply_markup = build_reminders_message(db)
+        if reply_markup is None:
+            await query.message.reply_text(message)
             return
-
-        status = "off" if disabled else "on"
-        message = f"*your reminders* ({status})\n\n"
-        message += "reminders are based on your /schedule:\n\n"
-        for entry in schedule:
-            message += f"  {entry['day']} at {entry['time']}\n"
-            message += f"    1h before: pretraining recap\n"
-            message += f"    1h after: note reminder\n\n"
-        message += "refresh reminders for completed goals run on mondays.\n"
-
-        if disabled:
-            keyboard = [[InlineKeyboardButton("turn reminders on", callback_data="rem_toggle_on")]]
-        else:
-            keyboard = [[InlineKeyboardButton("turn reminders off", callback_data="rem_toggle_off")]]
-
-        await query.message.reply_text(
-            message,
-            parse_mode="Markdown",
-            reply_markup=InlineKeyboardMarkup(keyboard),
-        )
+        await query.message.reply_text(message, parse_mode="Markdown", reply_markup=reply_markup)
         return
 
     if cmd == "map":
-        img_buf = render_app_map()
-        await query.message.reply_photo(
-            photo=img_buf,
-            caption="here's how the bot is organized. tap /help to open the menu.",
-        )
+        await send_app_map(query.message)
         return
 
     await query.message.reply_text(f"type /{cmd} to continue.")
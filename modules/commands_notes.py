@@ -1,14 +1,36 @@
 import uuid
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import asyncio
+import logging
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes, ConversationHandler
 
 from .database import load_database, save_database
-from .helpers import find_techniques_in_text, get_current_week, now_se
-from .note_image import render_notes_page
+from .helpers import get_current_week, now_se
+from .technique_detector import detect_techniques
+from .toolbox import known_mask, is_known
+from .note_image import render_page
+from .notes_pages import (
+    page_bounds, page_keys, record_note, drop_note, reflow_from, reset, current_page_keys, drop_stale_pages,
+)
+from . import page_cache
+from . import render_service
+from . import user_stats
+
+logger = logging.getLogger(__name__)
 
 state_note_writing = 2
 state_note_editing = 3
 manage_per_page = 5
+max_technique_buttons = 3
+# telegram media groups hold 2 to 10 photos
+album_max = 10
+prefetch_pages = 2
+
+busy_message = "lots of pages are being drawn right now, please try again in a moment."
+
+# page key -> background render task, so a page is prefetched once at a time
+_prefetching = {}
 
 
 def _backfill_ids(notes):
@@ -20,6 +42,16 @@ def _backfill_ids(notes):
     return changed
 
 
+def _technique_buttons(detected):
+    rows = []
+    for t in detected:
+        if not t["key"] or len(rows) >= max_technique_buttons:
+            continue
+        cat_id, tech_id = t["key"].split(":", 1)
+        rows.append([InlineKeyboardButton(f"📚 {t['label'].lower()}", callback_data=f"techitem_{cat_id}_{tech_id}")])
+    return rows
+
+
 def _find_note(notes, note_id):
     for i, n in enumerate(notes):
         if n.get("id") == note_id:
@@ -53,33 +85,43 @@ async def note_receive_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return state_note_writing
 
     now = now_se()
-    techs = find_techniques_in_text(text)
-    db["notes"].append({
+    detected = detect_techniques(text)
+    techs = [t["label"] for t in detected]
+    note = {
         "id": uuid.uuid4().hex[:8],
         "date": now.strftime("%Y-%m-%d"),
         "time": now.strftime("%H:%M"),
         "day": now.strftime("%A"),
         "text": text,
         "techniques": techs,
+        "technique_keys": [t["key"] for t in detected if t["key"]],
         "created_at": now.isoformat(),
-    })
+    }
+    db["notes"].append(note)
+    record_note(db, note)
+    user_stats.note_added(db, note)
+    reflow_from(db, len(db["notes"]) - 1)
     save_database(chat_id, db)
 
     reply = "note saved!\n\n"
-    if techs:
-        reply += f"detected: {', '.join(techs)}\n\n"
+    if detected:
+        toolbox = known_mask(chat_id, db)
+        labels = [f"{t['label']} ✓" if is_known(toolbox, t["key"]) else t["label"] for t in detected]
+        reply += f"detected: {', '.join(labels)}\n\n"
 
+    keyboard = []
     hint = _extract_work_on(text)
     if hint:
         reply += f"sounds like you want to work on:\n_{hint}_\n"
         context.user_data["pending_goal_text"] = hint
-        await update.message.reply_text(
-            reply,
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("set as goal", callback_data="notegoal_yes"),
-                InlineKeyboardButton("no thanks", callback_data="notegoal_no"),
-            ]]),
-        )
+        keyboard.append([
+            InlineKeyboardButton("set as goal", callback_data="notegoal_yes"),
+            InlineKeyboardButton("no thanks", callback_data="notegoal_no"),
+        ])
+    keyboard.extend(_technique_buttons(detected))
+
+    if keyboard:
+        await update.message.reply_text(reply, reply_markup=InlineKeyboardMarkup(keyboard))
     else:
         await update.message.reply_text(reply)
     return ConversationHandler.END
@@ -146,6 +188,7 @@ async def note_goal_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         "refresh_schedule": [],
         "refresh_index": 0,
     })
+    user_stats.goal_changed(db, None, "active")
     save_database(chat_id, db)
     await query.edit_message_text(
         f"goal set for {get_current_week()}:\n\n_{goal_text}_\n\n({active + 1}/3 goal slots used)",
@@ -153,38 +196,146 @@ async def note_goal_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
 
 
-async def send_notes_page(target, chat_id, page):
+def _renderer(notes, bounds, goals, focus, page):
+    start, end, content_h = bounds[page - 1]
+    return lambda: render_service.run(render_page, notes[start:end], content_h, goals, focus, page == 1)
+
+
+async def _prefetch_one(key, render):
+    try:
+        page_cache.store(key, await render())
+    except Exception as err:
+        logger.warning("page prefetch failed: %s", err)
+    finally:
+        _prefetching.pop(key, None)
+
+
+async def _await_prefetch(keys):
+    # a page already rendering in the background is waited for, not rendered twice
+    tasks = [_prefetching[key] for key in keys if key in _prefetching]
+    if tasks:
+        await asyncio.gather(*(asyncio.shield(t) for t in tasks))
+
+
+def _prefetch(notes, bounds, keys, goals, focus, pages):
+    # render pages the reader is likely to open next while they look at this one
+    for page in pages:
+        if page < 1 or page > len(bounds):
+            continue
+        key = keys[page - 1]
+        if key in _prefetching or page_cache.contains(key):
+            continue
+        render = _renderer(notes, bounds, goals, focus, page)
+        _prefetching[key] = asyncio.create_task(_prefetch_one(key, render))
+
+
+def _load_pages(chat_id):
     db = load_database(chat_id)
     notes = db.get("notes", [])
     goals = [g for g in db.get("goals", []) if g.get("status") == "active"]
     focus = db.get("active_drill")
-
     if not notes and not goals and not focus:
-        await target.reply_text("no notes yet. use /note after training!")
-        return
+        return None
 
-    if _backfill_ids(notes):
+    backfilled = _backfill_ids(notes)
+    if backfilled:
+        reset(db)
+    bounds, changed = page_bounds(db, goals, focus)
+    if backfilled or changed:
         save_database(chat_id, db)
+    return notes, goals, focus, bounds, page_keys(db, bounds, goals, focus)
 
-    page_images = render_notes_page(notes, goals=goals, focus=focus)
-    total = max(1, len(page_images))
+
+def _nav_keyboard(first, last, total):
+    # an album view pages by album, a single page view by page
+    step = "notesalbum" if first != last else "notespage"
+    buttons = []
+    if first > 1:
+        buttons.append(InlineKeyboardButton("« older", callback_data=f"{step}_{first - 1}"))
+    label = f"{last} / {total}" if first == last else f"{first}-{last} / {total}"
+    buttons.append(InlineKeyboardButton(label, callback_data="notespage_noop"))
+    if last < total:
+        # an album is addressed by its newest page, so the next one ends a full album later
+        newer = min(total, last + (last - first + 1))
+        buttons.append(InlineKeyboardButton("newer »", callback_data=f"{step}_{newer}"))
+    rows = [buttons]
+    if first == last and last > 1:
+        rows.append([InlineKeyboardButton(f"🗂 {min(album_max, last)} pages at once", callback_data=f"notesalbum_{last}")])
+    return InlineKeyboardMarkup(rows)
+
+
+async def send_notes_page(target, chat_id, page):
+    loaded = _load_pages(chat_id)
+    if loaded is None:
+        await target.reply_text("no notes yet. use /note after training!")
+        return
+    notes, goals, focus, bounds, keys = loaded
+
+    total = len(bounds)
     if page == -1:
         page = total
     page = max(1, min(page, total))
 
-    await target.reply_photo(photo=page_images[page - 1])
-
-    buttons = []
-    if page > 1:
-        buttons.append(InlineKeyboardButton("« older", callback_data=f"notespage_{page - 1}"))
-    buttons.append(InlineKeyboardButton(f"{page} / {total}", callback_data="notespage_noop"))
-    if page < total:
-        buttons.append(InlineKeyboardButton("newer »", callback_data=f"notespage_{page + 1}"))
+    await _await_prefetch([keys[page - 1]])
+    try:
+        await page_cache.reply_cached(target, keys[page - 1], _renderer(notes, bounds, goals, focus, page))
+    except render_service.RenderBusy:
+        await target.reply_text(busy_message)
+        return
+    _prefetch(notes, bounds, keys, goals, focus, range(page - 1, page - 1 - prefetch_pages, -1))
 
     await target.reply_text(
         f"_page {page} of {total}  ({len(notes)} notes total)_",
         parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup([buttons]),
+        reply_markup=_nav_keyboard(page, page, total),
+    )
+
+
+async def send_notes_album(target, chat_id, page):
+    # the given page and up to album_max - 1 older ones as a single media group
+    loaded = _load_pages(chat_id)
+    if loaded is None:
+        await target.reply_text("no notes yet. use /note after training!")
+        return
+    notes, goals, focus, bounds, keys = loaded
+
+    total = len(bounds)
+    page = max(1, min(page, total))
+    first = max(1, page - album_max + 1)
+    if first == page:
+        await send_notes_page(target, chat_id, page)
+        return
+
+    pages = range(first, page + 1)
+    renders = [_renderer(notes, bounds, goals, focus, p) for p in pages]
+    await _await_prefetch([keys[p - 1] for p in pages])
+    try:
+        photos = await asyncio.gather(*(page_cache.cached_or_render(keys[p - 1], r) for p, r in zip(pages, renders)))
+        try:
+            sent = await target.reply_media_group([InputMediaPhoto(photo) for photo in photos])
+        except BadRequest:
+            for p in pages:
+                page_cache.forget_file_id(keys[p - 1])
+            photos = await asyncio.gather(*(page_cache.cached_or_render(keys[p - 1], r) for p, r in zip(pages, renders)))
+            try:
+                sent = await target.reply_media_group([InputMediaPhoto(photo) for photo in photos])
+            except BadRequest as err:
+                # the album itself is refused; the newest page still goes out on its own
+                logger.warning("notes album failed twice, sending page %d alone: %s", page, err)
+                await send_notes_page(target, chat_id, page)
+                return
+    except render_service.RenderBusy:
+        await target.reply_text(busy_message)
+        return
+    for p, message in zip(pages, sent or []):
+        if message.photo:
+            page_cache.remember_file_id(keys[p - 1], message.photo[-1].file_id)
+    _prefetch(notes, bounds, keys, goals, focus, range(first - 1, first - 1 - prefetch_pages, -1))
+
+    await target.reply_text(
+        f"_pages {first}-{page} of {total}  ({len(notes)} notes total)_",
+        parse_mode="Markdown",
+        reply_markup=_nav_keyboard(first, page, total),
     )
 
 
@@ -197,6 +348,10 @@ async def notes_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     if query.data == "notespage_noop":
         return
+    if query.data.startswith("notesalbum_"):
+        page = int(query.data.replace("notesalbum_", ""))
+        await send_notes_album(query.message, query.message.chat_id, page)
+        return
     page = int(query.data.replace("notespage_", ""))
     await send_notes_page(query.message, query.message.chat_id, page)
 
@@ -213,6 +368,7 @@ async def _send_manage_page(target, chat_id, page):
         return
 
     if _backfill_ids(notes):
+        reset(db)
         save_database(chat_id, db)
 
     total_pages = max(1, -(-len(notes) // manage_per_page))
@@ -273,7 +429,12 @@ async def note_manage_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         if idx == -1:
             await query.edit_message_text("note not found, it may have been deleted already.")
             return
+        before = current_page_keys(db)
         removed = notes.pop(idx)
+        drop_note(db, nid)
+        user_stats.note_removed(db, removed)
+        reflow_from(db, idx)
+        drop_stale_pages(db, before)
         save_database(chat_id, db)
         short = removed.get("text", "")[:25]
         await query.edit_message_text(f"deleted: _{short}_\n\nuse /journal to manage notes.", parse_mode="Markdown")
@@ -320,8 +481,14 @@ async def note_edit_receive(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("note not found, it may have been deleted.")
         return ConversationHandler.END
 
+    before = current_page_keys(db)
+    detected = detect_techniques(text)
     notes[idx]["text"] = text
-    notes[idx]["techniques"] = find_techniques_in_text(text)
+    notes[idx]["techniques"] = [t["label"] for t in detected]
+    notes[idx]["technique_keys"] = [t["key"] for t in detected if t["key"]]
+    record_note(db, notes[idx])
+    reflow_from(db, idx)
+    drop_stale_pages(db, before)
     save_database(chat_id, db)
     await update.message.reply_text("note updated!")
     return ConversationHandler.END
@@ -3,20 +3,22 @@ from telegram.ext import ContextTypes
 
 from .database import load_database, save_database
 from .reminders import schedule_all_reminders
+from .helpers import zone, user_tz_name
+from . import training_log
+from . import user_stats
 
 
-async def reminders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    chat_id = update.effective_chat.id
-    db = load_database(chat_id)
+def build_reminders_message(db):
+    # returns (text, reply_markup) for /reminders and the menu button
     schedule = db.get("schedule", [])
     disabled = db.get("reminders_disabled", False)
 
     if not schedule:
-        await update.message.reply_text(
+        return (
             "no training schedule set yet. use /schedule first, "
-            "reminders are created automatically from your schedule."
+            "reminders are created automatically from your schedule.",
+            None,
         )
-        return
 
     status = "off" if disabled else "on"
     message = f"*your reminders* ({status})\n\n"
@@ -27,18 +29,24 @@ async def reminders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message += f"    1h before: pretraining recap\n"
         message += f"    1h after: note reminder\n\n"
 
-    message += "refresh reminders for completed goals run on mondays.\n"
+    checkin_at = db.get("reminder_times", {}).get("daily_checkin", "20:00")
+    message += f"every day at {checkin_at}: did you train today?\n"
+    message += "refresh reminders for completed goals arrive at 10:00 on the day they are due.\n"
 
     if disabled:
         keyboard = [[InlineKeyboardButton("turn reminders on", callback_data="rem_toggle_on")]]
     else:
         keyboard = [[InlineKeyboardButton("turn reminders off", callback_data="rem_toggle_off")]]
+    return message, InlineKeyboardMarkup(keyboard)
+
 
-    await update.message.reply_text(
-        message,
-        parse_mode="Markdown",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-    )
+async def reminders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    db = load_database(update.effective_chat.id)
+    message, reply_markup = build_reminders_message(db)
+    if reply_markup is None:
+        await update.message.reply_text(message)
+        return
+    await update.message.reply_text(message, parse_mode="Markdown", reply_markup=reply_markup)
 
 
 async def reminder_toggle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -60,3 +68,26 @@ async def reminder_toggle_callback(update: Update, context: ContextTypes.DEFAULT
         save_database(chat_id, db)
         schedule_all_reminders(chat_id, context.application.job_queue)
         await query.edit_message_text("reminders turned on. use /reminders to see details.")
+
+
+async def checkin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    trained = query.data == "checkin_yes"
+
+    chat_id = query.message.chat_id
+    db = load_database(chat_id)
+    # the day the question was asked, so a late answer logs the right day
+    day = query.message.date.astimezone(zone(user_tz_name(db))).strftime("%Y-%m-%d")
+    if training_log.record_checkin(db, day, trained):
+        save_database(chat_id, db)
+
+    if trained:
+        message = f"logged {day} as a training day 🥋"
+        streak = user_stats.streak(db, day)
+        if streak > 1:
+            message += f"\n🔥 streak: {streak} days"
+        message += "\n\nuse /note to write down what you learned."
+    else:
+        message = f"logged {day} as a rest day 😴\nrecovery is part of training."
+    await query.edit_message_text(message)
@@ -3,7 +3,7 @@ from telegram.ext import ContextTypes
 
 from .database import load_database, save_database
 from .reminders import schedule_all_reminders
-from .helpers import now_se
+from .helpers import now_se, user_tz_name, find_timezone
 
 days_of_week = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 day_to_num = {
@@ -16,6 +16,19 @@ day_to_num = {
     "Sunday": 6,
 }
 
+common_timezones = [
+    "Europe/Stockholm", "Europe/London", "Europe/Berlin", "Europe/Helsinki",
+    "Europe/Moscow", "America/New_York", "America/Chicago", "America/Los_Angeles",
+    "America/Sao_Paulo", "Asia/Dubai", "Asia/Bangkok", "Australia/Sydney",
+]
+
+
+async def _set_timezone(chat_id, tz_name, job_queue):
+    db = load_database(chat_id)
+    db["timezone"] = tz_name
+    save_database(chat_id, db)
+    schedule_all_reminders(chat_id, job_queue)
+
 
 async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
@@ -35,6 +48,7 @@ async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         message += "no training days set yet.\n\n"
 
+    message += f"times are in `{user_tz_name(db)}`.\n\n"
     message += "tap a day to add a training session:"
 
     keyboard = []
@@ -53,6 +67,7 @@ async def schedule_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 callback_data=f"sched_rm_{idx}",
             )])
         keyboard.append([InlineKeyboardButton("🗑 clear entire schedule", callback_data="sched_clear")])
+    keyboard.append([InlineKeyboardButton("🌍 change time zone", callback_data="sched_tz")])
 
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.message.reply_text(message, parse_mode="Markdown", reply_markup=reply_markup)
@@ -156,6 +171,56 @@ async def schedule_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         schedule_all_reminders(chat_id, context.application.job_queue)
         await query.edit_message_text("schedule cleared. use /schedule to set new training days.")
 
+    elif data == "sched_tz":
+        keyboard = []
+        for i in range(0, len(common_timezones), 2):
+            keyboard.append([
+                InlineKeyboardButton(name.split("/")[-1].replace("_", " "), callback_data=f"sched_tzset_{name}")
+                for name in common_timezones[i:i + 2]
+            ])
+        keyboard.append([InlineKeyboardButton("« cancel", callback_data="sched_cancel")])
+        await query.edit_message_text(
+            "pick your time zone, or send `/timezone <city>` for any other, e.g. `/timezone Lisbon`.",
+            parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+        )
+
+    elif data.startswith("sched_tzset_"):
+        tz_name = find_timezone(data[len("sched_tzset_"):])
+        if not tz_name:
+            return
+        await _set_timezone(query.message.chat_id, tz_name, context.application.job_queue)
+        await query.edit_message_text(
+            f"time zone set to `{tz_name}`. reminders follow your local time, daylight saving included.",
+            parse_mode="Markdown",
+        )
+
     elif data == "sched_cancel":
         context.user_data.pop("sched_pending_day", None)
         await query.edit_message_text("cancelled. use /schedule to try again.")
+
+
+async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    if not context.args:
+        db = load_database(chat_id)
+        await update.message.reply_text(
+            f"your time zone is `{user_tz_name(db)}`.\n"
+            f"change it with `/timezone <city>`, e.g. `/timezone London` or `/timezone America/New_York`.",
+            parse_mode="Markdown",
+        )
+        return
+
+    tz_name = find_timezone(" ".join(context.args))
+    if not tz_name:
+        await update.message.reply_text(
+            "i don't know that time zone. try a city like `London` or a name like `Europe/London`.",
+            parse_mode="Markdown",
+        )
+        return
+
+    await _set_timezone(chat_id, tz_name, context.application.job_queue)
+    await update.message.reply_text(
+        f"time zone set to `{tz_name}`. reminders follow your local time, daylight saving included.",
+        parse_mode="Markdown",
+    )
@@ -5,46 +5,99 @@ from telegram.ext import ContextTypes
 from .techniques_data import all_techniques
 from .database import load_database, save_database
 from .helpers import now_se
+from .toolbox import (
+    toolbox_key,
+    known_mask,
+    is_known,
+    category_masks,
+    add_technique,
+    remove_technique,
+    refresh,
+    toolbox_entries,
+    total_techniques,
+)
+
+library_links = (
+    "_want more beyond beginner blocks?_\n"
+    "[The Grappling Academy](https://www.youtube.com/@TheGrapplingAcademy/playlists)\n"
+    "[Knight Jiu Jitsu](https://www.youtube.com/@KnightJiuJitsu/playlists)"
+)
+
+# the catalog never changes while the bot runs, so labels, callback data and
+# detail texts are built once; only check marks and counts depend on the user
+_category_rows = []
+_item_rows = {}
+_item_texts = {}
+
+
+def _build_views():
+    for cat_id, cat_data in all_techniques.items():
+        rows = []
+        for tech_id, tech in cat_data["items"].items():
+            key = toolbox_key(cat_id, tech_id)
+            rows.append((key, tech["name"], f"techitem_{cat_id}_{tech_id}"))
+            _item_texts[key] = (
+                f"{tech['description']}\n\n"
+                f"[watch tutorial]({tech['video_url']})"
+            )
+        total = len(cat_data["items"])
+        _category_rows.append((cat_data["name"], f"techcat_{cat_id}", category_masks[cat_id], total))
+        _item_rows[cat_id] = rows
 
 
-def toolbox_key(cat_id, tech_id):
-    return f"{cat_id}:{tech_id}"
+_build_views()
 
 
-def get_toolbox(db):
-    toolbox_keys = set()
-    for entry in db.get("toolbox", []):
-        toolbox_keys.add(entry["key"])
-    return toolbox_keys
+def category_keyboard(known):
+    keyboard = []
+    for name, callback, mask, total in _category_rows:
+        label = name
+        count = (mask & known).bit_count()
+        if count > 0:
+            label += f" ({count}/{total} ✓)"
+        keyboard.append([InlineKeyboardButton(label, callback_data=callback)])
+    return InlineKeyboardMarkup(keyboard)
 
 
-async def technique_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    chat_id = update.effective_chat.id
-    db = load_database(chat_id)
-    toolbox = get_toolbox(db)
+def items_keyboard(cat_id, known):
+    keyboard = []
+    for key, name, callback in _item_rows[cat_id]:
+        prefix = "✓ " if is_known(known, key) else ""
+        keyboard.append([InlineKeyboardButton(f"{prefix}{name}", callback_data=callback)])
+    keyboard.append([InlineKeyboardButton("« back to categories", callback_data="tech_main")])
+    return InlineKeyboardMarkup(keyboard)
 
+
+def item_keyboard(cat_id, tech_id, known):
     keyboard = []
-    for cat_id, cat_data in all_techniques.items():
-        total = len(cat_data["items"])
-        known = 0
-        for tech_id in cat_data["items"]:
-            if toolbox_key(cat_id, tech_id) in toolbox:
-                known += 1
-        label = cat_data["name"]
-        if known > 0:
-            label += f" ({known}/{total} ✓)"
-        keyboard.append([InlineKeyboardButton(label, callback_data=f"techcat_{cat_id}")])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    text = (
-        "*techniques library*\n\nchoose a category:\n\n"
-        "_want more beyond beginner blocks?_\n"
-        "[The Grappling Academy](https://www.youtube.com/@TheGrapplingAcademy/playlists)\n"
-        "[Knight Jiu Jitsu](https://www.youtube.com/@KnightJiuJitsu/playlists)"
-    )
+    if known:
+        keyboard.append([InlineKeyboardButton("✓ in your toolbox, remove", callback_data=f"techunknow_{cat_id}_{tech_id}")])
+    else:
+        keyboard.append([InlineKeyboardButton("focus on this (2 weeks)", callback_data=f"techdrill_{cat_id}_{tech_id}")])
+        keyboard.append([InlineKeyboardButton("i know this, add to toolbox", callback_data=f"techknow_{cat_id}_{tech_id}")])
+    keyboard.append([InlineKeyboardButton("« back", callback_data=f"techcat_{cat_id}")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+def _parse_item(data):
+    parts = data.split("_")
+    if len(parts) < 3:
+        return None
+    cat_id, tech_id = parts[1], parts[2]
+    if cat_id not in all_techniques or tech_id not in all_techniques[cat_id]["items"]:
+        return None
+    return cat_id, tech_id, all_techniques[cat_id]["items"][tech_id]
+
+
+async def technique_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    text = "*techniques library*\n\nchoose a category:\n\n" + library_links
 
     await update.message.reply_text(
-        text, parse_mode="Markdown", reply_markup=reply_markup, disable_web_page_preview=True,
+        text,
+        parse_mode="Markdown",
+        reply_markup=category_keyboard(known_mask(chat_id)),
+        disable_web_page_preview=True,
     )
 
 
@@ -54,27 +107,12 @@ async def technique_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     data = query.data
     chat_id = query.message.chat_id
-    db = load_database(chat_id)
-    toolbox = get_toolbox(db)
 
     if data == "tech_main":
-        keyboard = []
-        for cat_id, cat_data in all_techniques.items():
-            total = len(cat_data["items"])
-            known = 0
-            for tech_id in cat_data["items"]:
-                if toolbox_key(cat_id, tech_id) in toolbox:
-                    known += 1
-            label = cat_data["name"]
-            if known > 0:
-                label += f" ({known}/{total} ✓)"
-            keyboard.append([InlineKeyboardButton(label, callback_data=f"techcat_{cat_id}")])
-
-        reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text(
             "*techniques library*\n\nchoose a category:",
             parse_mode="Markdown",
-            reply_markup=reply_markup,
+            reply_markup=category_keyboard(known_mask(chat_id)),
         )
         return
 
@@ -83,135 +121,55 @@ async def technique_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         if cat_id not in all_techniques:
             return
 
-        category = all_techniques[cat_id]
-        keyboard = []
-        for tech_id, tech_data in category["items"].items():
-            key = toolbox_key(cat_id, tech_id)
-            prefix = "✓ " if key in toolbox else ""
-            keyboard.append([InlineKeyboardButton(
-                f"{prefix}{tech_data['name']}",
-                callback_data=f"techitem_{cat_id}_{tech_id}",
-            )])
-
-        keyboard.append([InlineKeyboardButton("« back to categories", callback_data="tech_main")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
         await query.edit_message_text(
-            f"*{category['name']}*\n\nchoose a technique:",
+            f"*{all_techniques[cat_id]['name']}*\n\nchoose a technique:",
             parse_mode="Markdown",
-            reply_markup=reply_markup,
+            reply_markup=items_keyboard(cat_id, known_mask(chat_id)),
         )
+        return
 
-    elif data.startswith("techitem_"):
-        parts = data.split("_")
-        cat_id = parts[1]
-        tech_id = parts[2]
-
-        if cat_id not in all_techniques or tech_id not in all_techniques[cat_id]["items"]:
-            return
-
-        tech = all_techniques[cat_id]["items"][tech_id]
-        key = toolbox_key(cat_id, tech_id)
-        known = key in toolbox
+    found = _parse_item(data)
+    if not found:
+        return
+    cat_id, tech_id, tech = found
+    key = toolbox_key(cat_id, tech_id)
 
-        text = (
-            f"*{tech['name']}*\n\n"
-            f"{tech['description']}\n\n"
-            f"[watch tutorial]({tech['video_url']})"
+    if data.startswith("techitem_"):
+        known = is_known(known_mask(chat_id), key)
+        await query.edit_message_text(
+            f"*{tech['name']}*\n\n{_item_texts[key]}",
+            parse_mode="Markdown",
+            reply_markup=item_keyboard(cat_id, tech_id, known),
+            disable_web_page_preview=False,
         )
 
-        keyboard = []
-
-        if known:
-            keyboard.append([InlineKeyboardButton("✓ in your toolbox, remove", callback_data=f"techunknow_{cat_id}_{tech_id}")])
-        else:
-            keyboard.append([InlineKeyboardButton("focus on this (2 weeks)", callback_data=f"techdrill_{cat_id}_{tech_id}")])
-            keyboard.append([InlineKeyboardButton("i know this, add to toolbox", callback_data=f"techknow_{cat_id}_{tech_id}")])
-
-        keyboard.append([InlineKeyboardButton("« back", callback_data=f"techcat_{cat_id}")])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.edit_message_text(text, parse_mode="Markdown", reply_markup=reply_markup, disable_web_page_preview=False)
-
     elif data.startswith("techknow_"):
-        parts = data.split("_")
-        cat_id = parts[1]
-        tech_id = parts[2]
-
-        if cat_id not in all_techniques or tech_id not in all_techniques[cat_id]["items"]:
-            return
-
-        tech = all_techniques[cat_id]["items"][tech_id]
-        key = toolbox_key(cat_id, tech_id)
-
-        if key not in toolbox:
-            db["toolbox"].append({
-                "key": key,
-                "name": tech["name"],
-                "category": all_techniques[cat_id]["name"],
-                "added_at": now_se().isoformat(),
-            })
+        db = load_database(chat_id)
+        if add_technique(db, key):
             save_database(chat_id, db)
-
-        keyboard = [
-            [InlineKeyboardButton("✓ in your toolbox, remove", callback_data=f"techunknow_{cat_id}_{tech_id}")],
-            [InlineKeyboardButton("« back", callback_data=f"techcat_{cat_id}")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+            refresh(chat_id, db)
 
         await query.edit_message_text(
-            f"✓ *{tech['name']}* added to your toolbox!\n\n"
-            f"{tech['description']}\n\n"
-            f"[watch tutorial]({tech['video_url']})",
+            f"✓ *{tech['name']}* added to your toolbox!\n\n{_item_texts[key]}",
             parse_mode="Markdown",
-            reply_markup=reply_markup,
+            reply_markup=item_keyboard(cat_id, tech_id, True),
             disable_web_page_preview=False,
         )
 
     elif data.startswith("techunknow_"):
-        parts = data.split("_")
-        cat_id = parts[1]
-        tech_id = parts[2]
-
-        if cat_id not in all_techniques or tech_id not in all_techniques[cat_id]["items"]:
-            return
-
-        tech = all_techniques[cat_id]["items"][tech_id]
-        key = toolbox_key(cat_id, tech_id)
-
-        new_toolbox = []
-        for entry in db.get("toolbox", []):
-            if entry["key"] != key:
-                new_toolbox.append(entry)
-        db["toolbox"] = new_toolbox
+        db = load_database(chat_id)
+        remove_technique(db, key)
         save_database(chat_id, db)
-
-        keyboard = [
-            [InlineKeyboardButton("focus on this (2 weeks)", callback_data=f"techdrill_{cat_id}_{tech_id}")],
-            [InlineKeyboardButton("i know this, add to toolbox", callback_data=f"techknow_{cat_id}_{tech_id}")],
-            [InlineKeyboardButton("« back", callback_data=f"techcat_{cat_id}")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        refresh(chat_id, db)
 
         await query.edit_message_text(
-            f"*{tech['name']}*\n\n"
-            f"{tech['description']}\n\n"
-            f"[watch tutorial]({tech['video_url']})",
+            f"*{tech['name']}*\n\n{_item_texts[key]}",
             parse_mode="Markdown",
-            reply_markup=reply_markup,
+            reply_markup=item_keyboard(cat_id, tech_id, False),
             disable_web_page_preview=False,
         )
 
     elif data.startswith("techdrill_"):
-        parts = data.split("_")
-        cat_id = parts[1]
-        tech_id = parts[2]
-
-        if cat_id not in all_techniques or tech_id not in all_techniques[cat_id]["items"]:
-            return
-
-        tech = all_techniques[cat_id]["items"][tech_id]
-
         db = load_database(chat_id)
 
         end_date = now_se() + timedelta(days=14)
@@ -221,7 +179,7 @@ async def technique_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
             "description": tech["description"],
             "video_url": tech["video_url"],
             "category": all_techniques[cat_id]["name"],
-            "toolbox_key": toolbox_key(cat_id, tech_id),
+            "toolbox_key": key,
             "start_date": now_se().isoformat(),
             "end_date": end_date.isoformat(),
         }
@@ -243,7 +201,7 @@ async def technique_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def toolbox_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     db = load_database(chat_id)
-    toolbox = db.get("toolbox", [])
+    toolbox = toolbox_entries(db)
 
     if not toolbox:
         await update.message.reply_text(
@@ -260,9 +218,7 @@ async def toolbox_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             by_category[cat] = []
         by_category[cat].append(entry["name"])
 
-    total_available = 0
-    for cat in all_techniques.values():
-        total_available += len(cat["items"])
+    total_available = total_techniques()
     total_known = len(toolbox)
 
     message = f"*your toolbox* ({total_known}/{total_available})\n\n"
@@ -1,12 +1,18 @@
 import json
 from pathlib import Path
 
+from . import user_stats
+
 data_directory = Path(__file__).parent.parent / "data"
 data_directory.mkdir(exist_ok=True)
 
 
+def user_file(chat_id):
+    return data_directory / f"user_{chat_id}.json"
+
+
 def load_database(chat_id):
-    path = data_directory / f"user_{chat_id}.json"
+    path = user_file(chat_id)
     if path.exists():
         with open(path, "r") as file:
             data = json.load(file)
@@ -14,8 +20,9 @@ def load_database(chat_id):
                 data["active_drill"] = None
             if "training_log" not in data:
                 data["training_log"] = []
-            if "toolbox" not in data:
-                data["toolbox"] = []
+            if "toolbox" not in data and "toolbox_bits" not in data:
+                data["toolbox_bits"] = "0"
+                data["toolbox_added"] = {}
             if "schedule" not in data:
                 data["schedule"] = []
             if "reminder_times" not in data:
@@ -29,6 +36,10 @@ def load_database(chat_id):
                 data["ai_usage"] = {"date": "", "count": 0}
             if "ai_history" not in data:
                 data["ai_history"] = []
+            if user_stats.stale(data):
+                # files from before db["stats"], or from an older stats_version
+                user_stats.rebuild(data)
+                save_database(chat_id, data)
             return data
 
     new_database = {
@@ -37,7 +48,8 @@ def load_database(chat_id):
         "drill_queue": [],
         "active_drill": None,
         "training_log": [],
-        "toolbox": [],
+        "toolbox_bits": "0",
+        "toolbox_added": {},
         "schedule": [],
         "reminder_times": {
             "daily_checkin": "20:00",
@@ -52,6 +64,6 @@ def load_database(chat_id):
 
 
 def save_database(chat_id, database):
-    path = data_directory / f"user_{chat_id}.json"
+    path = user_file(chat_id)
     with open(path, "w") as file:
         json.dump(database, file, indent=2, default=str, ensure_ascii=False)
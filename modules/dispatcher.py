@@ -0,0 +1,185 @@
+import heapq
+import asyncio
+import logging
+import itertools
+from collections import deque
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from .helpers import percentile
+
+logger = logging.getLogger(__name__)
+
+# lanes, lower goes first: replies to a user beat reminder broadcasts
+interactive = 0
+bulk = 1
+lane_names = {interactive: "interactive", bulk: "bulk"}
+
+# telegram allows about 30 messages a second overall, one a second to a private
+# chat and 20 a minute to a group; a chat may get a short burst (a photo plus
+# its caption message) before pacing starts
+global_rate = 30
+private_interval = 1.0
+group_interval = 3.0
+chat_burst = 3
+max_retries = 3
+lag_samples = 2000
+
+
+def _seconds(retry_after):
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class FloodLimiter(BaseRateLimiter):
+    """Token bucket for everything sent to a chat, with per-chat pacing,
+    priority lanes and RetryAfter handling. Requests without a chat id
+    (callback answers, webhooks, files) pass straight through."""
+
+    def __init__(self, rate=global_rate, burst=global_rate):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._refilled_at = None
+        self._paused_until = 0.0
+        # heap of (lane, seq, future) waiting for a token
+        self._waiting = []
+        self._seq = itertools.count()
+        self._pump_task = None
+        # chat_id -> theoretical arrival time of the chat's next message
+        self._chat_next = {}
+        self._lags = {lane: deque(maxlen=lag_samples) for lane in lane_names}
+        self.counters = {"sent": 0, "retries": 0, "failed": 0, "retry_after_s": 0.0, "max_depth": 0}
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            self._pump_task = None
+        for _, _, fut in self._waiting:
+            fut.cancel()
+        self._waiting.clear()
+
+    def _refill(self, now):
+        if self._refilled_at is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    async def _pump(self):
+        loop = asyncio.get_running_loop()
+        while self._waiting:
+            now = loop.time()
+            self._refill(now)
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+            _, _, fut = heapq.heappop(self._waiting)
+            if fut.done():
+                continue
+            self._tokens -= 1
+            fut.set_result(None)
+        self._pump_task = None
+
+    async def _take_token(self, lane):
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (lane, next(self._seq), fut))
+        self.counters["max_depth"] = max(self.counters["max_depth"], len(self._waiting))
+        if self._pump_task is None:
+            self._pump_task = asyncio.create_task(self._pump())
+        await fut
+
+    def _reserve_chat(self, chat_id, now):
+        # generic cell rate: each message pushes the chat's clock one interval
+        # ahead and anything beyond the burst allowance waits, so a flood to one
+        # chat is spread out before it competes for the global bucket
+        interval = group_interval if str(chat_id).startswith("-") else private_interval
+        tat = max(now, self._chat_next.get(chat_id, now))
+        self._chat_next[chat_id] = tat + interval
+        if len(self._chat_next) > 10000:
+            self._chat_next = {c: t for c, t in self._chat_next.items() if t > now}
+        return max(0.0, tat - now - (chat_burst - 1) * interval)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await self._call(callback, args, kwargs, endpoint)
+
+        lane = bulk if rate_limit_args == bulk else interactive
+        loop = asyncio.get_running_loop()
+        queued_at = loop.time()
+        delay = self._reserve_chat(chat_id, queued_at)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._take_token(lane)
+        self._lags[lane].append(loop.time() - queued_at)
+        return await self._call(callback, args, kwargs, endpoint)
+
+    async def _call(self, callback, args, kwargs, endpoint):
+        loop = asyncio.get_running_loop()
+        for attempt in range(max_retries + 1):
+            try:
+                result = await callback(*args, **kwargs)
+                self.counters["sent"] += 1
+                return result
+            except RetryAfter as err:
+                wait = _seconds(err.retry_after)
+                self.counters["retry_after_s"] += wait
+                if attempt == max_retries:
+                    self.counters["failed"] += 1
+                    raise
+                self.counters["retries"] += 1
+                logger.warning("flood limit on %s, retrying in %.1fs", endpoint, wait)
+                # flood limits are per bot, so hold every lane, not just this request
+                self._paused_until = max(self._paused_until, loop.time() + wait)
+                await asyncio.sleep(wait)
+
+    def queue_depth(self):
+        depth = {name: 0 for name in lane_names.values()}
+        for lane, _, fut in self._waiting:
+            if not fut.done():
+                depth[lane_names[lane]] += 1
+        return depth
+
+    def stats(self):
+        lags = {}
+        for lane, samples in self._lags.items():
+            lags[lane_names[lane]] = {
+                "count": len(samples),
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "max": max(samples, default=0.0),
+            }
+        return {"queue_depth": self.queue_depth(), "lag_s": lags, **self.counters}
+
+
+limiter = FloodLimiter()
+
+
+def bulk_args(bot):
+    # rate_limit_args is rejected by bots built without a rate limiter
+    return {"rate_limit_args": bulk} if getattr(bot, "rate_limiter", None) else {}
+
+
+def build_report():
+    s = limiter.stats()
+    depth = s["queue_depth"]
+    lines = [
+        "outbound messages",
+        f"  sent {s['sent']}  retries {s['retries']}  failed {s['failed']}  "
+        f"retry_after {s['retry_after_s']:.0f}s",
+        f"  queued now: interactive {depth['interactive']}  bulk {depth['bulk']}  (max {s['max_depth']})",
+    ]
+    for name, lag in s["lag_s"].items():
+        if lag["count"]:
+            lines.append(
+                f"  {name} lag p50 {lag['p50']:.2f}s  p95 {lag['p95']:.2f}s  max {lag['max']:.2f}s  (n={lag['count']})"
+            )
+    return "\n".join(lines)
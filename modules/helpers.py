@@ -1,7 +1,10 @@
+import math
 from datetime import datetime, time
-from zoneinfo import ZoneInfo
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
 
-SE_TZ = ZoneInfo("Europe/Stockholm")
+default_tz_name = "Europe/Stockholm"
+SE_TZ = ZoneInfo(default_tz_name)
 
 
 def now_se():
@@ -12,6 +15,34 @@ def time_se(hour, minute=0):
     return time(hour=hour, minute=minute, tzinfo=SE_TZ)
 
 
+@lru_cache(maxsize=None)
+def zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return SE_TZ
+
+
+def user_tz_name(database):
+    return database.get("timezone") or default_tz_name
+
+
+@lru_cache(maxsize=1)
+def _zone_names():
+    names = {}
+    for name in sorted(available_timezones()):
+        names[name.lower()] = name
+    for name in sorted(available_timezones()):
+        # "london" or "new_york" for Europe/London, America/New_York
+        names.setdefault(name.rsplit("/", 1)[-1].lower(), name)
+    return names
+
+
+def find_timezone(text):
+    # an IANA name, or just its city, matched case-insensitively; None if unknown
+    return _zone_names().get(text.strip().lower().replace(" ", "_"))
+
+
 def get_current_week():
     now = now_se()
     year = now.isocalendar()[0]
@@ -19,36 +50,9 @@ def get_current_week():
     return f"{year}-W{week:02d}"
 
 
-def find_techniques_in_text(text):
-    known_techniques = [
-        "hip escape", "shrimp", "bridge", "technical stand-up", "granby roll",
-        "elbow escape", "trap and roll", "upa",
-        "closed guard", "half guard", "open guard", "butterfly guard",
-        "de la riva", "spider guard", "lasso guard", "x-guard",
-        "single leg x", "rubber guard",
-        "torreando", "double under", "knee slice", "knee cut",
-        "leg drag", "smash pass", "over-under", "stack pass",
-        "long step", "body lock pass",
-        "scissor sweep", "flower sweep", "hip bump", "butterfly sweep",
-        "tripod sweep", "pendulum sweep", "sickle sweep",
-        "single leg", "double leg", "hip throw", "ankle pick",
-        "osoto gari", "arm drag", "snap down", "collar drag",
-        "armbar", "triangle", "rear naked choke", "rnc",
-        "guillotine", "kimura", "americana", "omoplata",
-        "ezekiel", "cross choke", "collar choke", "bow and arrow",
-        "arm triangle", "darce", "anaconda", "north-south choke",
-        "loop choke", "baseball choke",
-        "mount", "side control", "back control", "knee on belly",
-        "turtle", "north-south", "crucifix",
-        "seatbelt", "underhook", "overhook", "frames",
-        "collar grip", "sleeve grip",
-    ]
-
-    text_lowercase = text.lower()
-    found_techniques = []
-
-    for technique in known_techniques:
-        if technique in text_lowercase:
-            found_techniques.append(technique.title())
-
-    return found_techniques
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
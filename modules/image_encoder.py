@@ -0,0 +1,66 @@
+import io
+import os
+
+from PIL import Image
+
+# pages are dark text on a light grid, so they compress well as long as the
+# encoder does not spend seconds searching for the last few percent.
+# IMAGE_FORMAT picks one of these; IMAGE_QUALITY applies to jpeg and webp.
+# the default stays lossless, png-palette trades colours for size and is opt-in
+formats = {
+    "png": ("PNG", ".png"),
+    "png-fast": ("PNG", ".png"),
+    "png-palette": ("PNG", ".png"),
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+default_format = "png-fast"
+default_quality = 85
+palette_colors = 32
+
+
+def format_name():
+    name = os.getenv("IMAGE_FORMAT", default_format).strip().lower()
+    return name if name in formats else default_format
+
+
+def quality():
+    try:
+        return min(100, max(1, int(os.getenv("IMAGE_QUALITY", default_quality))))
+    except ValueError:
+        return default_quality
+
+
+def signature(name=None):
+    # goes into cache keys so switching encoders does not serve old files
+    name = name or format_name()
+    if name in ("jpeg", "webp"):
+        return f"{name}:{quality()}"
+    return name
+
+
+def encode(img, stem, name=None, q=None):
+    name = name or format_name()
+    q = q or quality()
+    pil_format, ext = formats[name]
+    buf = io.BytesIO()
+
+    if name == "png":
+        img.save(buf, format=pil_format, optimize=True)
+    elif name == "png-fast":
+        img.save(buf, format=pil_format, compress_level=1)
+    elif name == "png-palette":
+        pal = img.quantize(colors=palette_colors, method=Image.Quantize.FASTOCTREE)
+        pal.save(buf, format=pil_format, compress_level=6)
+    elif name == "jpeg":
+        img.save(buf, format=pil_format, quality=q, subsampling=2)
+    else:
+        img.save(buf, format=pil_format, quality=q, method=4)
+
+    buf.seek(0)
+    buf.name = stem + ext
+    return buf
+
+
+def file_name(stem, name=None):
+    return stem + formats[name or format_name()][1]
@@ -0,0 +1,163 @@
+import json
+import sqlite3
+import logging
+import functools
+from contextlib import contextmanager, nullcontext
+
+from .database import data_directory
+
+logger = logging.getLogger(__name__)
+
+# reminder bookkeeping that has to outlive a restart: which chats are in which
+# slot, when each slot is due next, and every refresh reminder's due date.
+# startup reads it back in a couple of queries instead of opening every user
+# file. slots are stored as json text so the key can grow without a migration
+store_file = data_directory / "jobs.sqlite3"
+
+_schema = """
+create table if not exists slot_members (
+    slot text not null,
+    chat_id integer not null,
+    primary key (slot, chat_id)
+);
+create table if not exists slot_runs (
+    slot text primary key,
+    next_run text not null
+);
+create table if not exists refresh_entries (
+    chat_id integer not null,
+    goal_id text not null,
+    due text not null,
+    idx integer not null,
+    primary key (chat_id, goal_id)
+);
+create table if not exists meta (
+    key text primary key,
+    value text not null
+);
+"""
+
+_conn = None
+# inside batch() writes share one transaction instead of committing each
+_batching = False
+
+
+def connect(path=None):
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(str(path or store_file))
+        _conn.execute("pragma journal_mode=wal")
+        _conn.execute("pragma synchronous=normal")
+        _conn.executescript(_schema)
+    return _conn
+
+
+def close():
+    global _conn
+    if _conn is not None:
+        _conn.close()
+        _conn = None
+
+
+@contextmanager
+def batch():
+    # groups every write made inside into a single commit, for the startup
+    # seed and for moving a user between slots
+    global _batching
+    if _batching:
+        yield
+        return
+    _batching = True
+    try:
+        with connect():
+            yield
+    finally:
+        _batching = False
+
+
+def _tx():
+    conn = connect()
+    return nullcontext(conn) if _batching else conn
+
+
+@functools.lru_cache(maxsize=4096)
+def _key(slot):
+    return json.dumps(list(slot))
+
+
+def _slot(key):
+    return tuple(json.loads(key))
+
+
+def get_meta(key, default=None):
+    row = connect().execute("select value from meta where key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(key, value):
+    with _tx() as conn:
+        conn.execute("insert or replace into meta (key, value) values (?, ?)", (key, str(value)))
+
+
+def add_members(rows):
+    # rows is [(slot, chat_id)]
+    with _tx() as conn:
+        conn.executemany(
+            "insert or ignore into slot_members (slot, chat_id) values (?, ?)",
+            [(_key(slot), chat_id) for slot, chat_id in rows],
+        )
+
+
+def remove_members(rows):
+    # rows is [(slot, chat_id)]
+    with _tx() as conn:
+        conn.executemany(
+            "delete from slot_members where slot = ? and chat_id = ?",
+            [(_key(slot), chat_id) for slot, chat_id in rows],
+        )
+
+
+def set_next_run(slot, when):
+    with _tx() as conn:
+        conn.execute(
+            "insert or replace into slot_runs (slot, next_run) values (?, ?)",
+            (_key(slot), when.isoformat()),
+        )
+
+
+def drop_slot(slot):
+    with _tx() as conn:
+        conn.execute("delete from slot_members where slot = ?", (_key(slot),))
+        conn.execute("delete from slot_runs where slot = ?", (_key(slot),))
+
+
+def load_slots():
+    # {slot: set of chat ids}
+    slots = {}
+    for key, chat_id in connect().execute("select slot, chat_id from slot_members"):
+        slots.setdefault(_slot(key), set()).add(chat_id)
+    return slots
+
+
+def next_runs():
+    # {slot: iso timestamp of its next run}
+    return {_slot(key): when for key, when in connect().execute("select slot, next_run from slot_runs")}
+
+
+def put_refresh(entries):
+    # entries is [(chat_id, goal_id, due, idx)]
+    with _tx() as conn:
+        conn.executemany(
+            "insert or replace into refresh_entries (chat_id, goal_id, due, idx) values (?, ?, ?, ?)",
+            entries,
+        )
+
+
+def drop_refresh(keys):
+    # keys is [(chat_id, goal_id)]
+    with _tx() as conn:
+        conn.executemany("delete from refresh_entries where chat_id = ? and goal_id = ?", keys)
+
+
+def load_refresh():
+    return connect().execute("select chat_id, goal_id, due, idx from refresh_entries").fetchall()
@@ -0,0 +1,62 @@
+# the /help menu, shared by the menu keyboards and the app map. items are
+# (button label, command) pairs; a command of None with a url is a link button
+developer_url = "https://www.linkedin.com/in/marialagerholm/"
+
+menu_sections = [
+    {
+        "key": "training",
+        "title": "my training",
+        "emoji": "📝",
+        "blurb": "track your sessions, goals, and progress.",
+        "items": [
+            ("write a note", "note"),
+            ("view my notes", "notes"),
+            ("manage notes", "journal"),
+            ("set a goal (max 3)", "goal"),
+            ("view my goals", "goals"),
+            ("current focus", "focus"),
+            ("my progress", "stats"),
+        ],
+    },
+    {
+        "key": "learn",
+        "title": "learn",
+        "emoji": "📚",
+        "blurb": "browse techniques and track what you know.",
+        "items": [
+            ("technique library", "technique"),
+            ("my toolbox", "toolbox"),
+        ],
+    },
+    {
+        "key": "knowledge",
+        "title": "bjj knowledge",
+        "emoji": "🥋",
+        "blurb": "tips, rules, and etiquette for the mats.",
+        "items": [
+            ("mindset", "mindset"),
+            ("training habits", "habits"),
+            ("mat etiquette", "etiquette"),
+            ("what to do", "dos"),
+            ("what not to do", "donts"),
+            ("competition scoring", "scoring"),
+            ("illegal moves", "illegal"),
+        ],
+    },
+    {
+        "key": "settings",
+        "title": "settings",
+        "emoji": "⚙️",
+        "blurb": "manage your schedule, reminders, and data.",
+        "items": [
+            ("training schedule", "schedule"),
+            ("reminders", "reminders"),
+            ("export my data", "export"),
+            ("import backup", "import"),
+            ("app map", "map"),
+            ("developer", None),
+        ],
+    },
+]
+
+sections_by_key = {s["key"]: s for s in menu_sections}
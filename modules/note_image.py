@@ -1,9 +1,13 @@
-import io
+import hashlib
 import textwrap
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 
 from PIL import Image, ImageDraw, ImageFont
 
+from . import image_encoder
+
 PAGE_W = 900
 PAGE_H = 1400
 ML = 70
@@ -27,17 +31,28 @@ def _has_cyrillic(text):
     return any(0x0400 <= ord(ch) <= 0x04FF for ch in text)
 
 
-def load_font(size, text=""):
-    if _has_cyrillic(text):
-        for name in ("Chickpeas.ttf", "Caveat-Regular.ttf"):
-            p = FONTS_DIR / name
-            if p.exists():
-                return ImageFont.truetype(str(p), size)
-    for name in ("ReenieBeanie-Regular.ttf", "Caveat-Regular.ttf"):
+@lru_cache(maxsize=2)
+def _font_path(cyrillic):
+    names = ("Chickpeas.ttf", "Caveat-Regular.ttf") if cyrillic else ()
+    for name in names + ("ReenieBeanie-Regular.ttf", "Caveat-Regular.ttf"):
         p = FONTS_DIR / name
         if p.exists():
-            return ImageFont.truetype(str(p), size)
-    return ImageFont.load_default(size=size)
+            return str(p)
+    return None
+
+
+@lru_cache(maxsize=64)
+def _cached_font(path, size):
+    if path is None:
+        return ImageFont.load_default(size=size)
+    return ImageFont.truetype(path, size)
+
+
+def load_font(size, text=""):
+    return _cached_font(_font_path(_has_cyrillic(text)), size)
+
+
+_measure = ImageDraw.Draw(Image.new("RGB", (1, 1)))
 
 
 def _date_prefix(note):
@@ -55,15 +70,14 @@ def _date_prefix(note):
 def _measure_date_w(prefix, font):
     if not prefix:
         return 0
-    tmp = ImageDraw.Draw(Image.new("RGB", (1, 1)))
-    bbox = tmp.textbbox((0, 0), prefix + "  ", font=font)
+    bbox = _measure.textbbox((0, 0), prefix + "  ", font=font)
     return bbox[2] - bbox[0]
 
 
+@lru_cache(maxsize=64)
 def _avg_char_w(font):
-    tmp = ImageDraw.Draw(Image.new("RGB", (1, 1)))
     sample = "abcdefghijklmnopqrstuvwxyz 0123456789"
-    bbox = tmp.textbbox((0, 0), sample, font=font)
+    bbox = _measure.textbbox((0, 0), sample, font=font)
     return max(1, (bbox[2] - bbox[0]) / len(sample))
 
 
@@ -92,52 +106,109 @@ def _wrap_text(text, date_w, font=None):
     return lines
 
 
-def _note_height(note):
+# layouts are keyed by note id plus a hash of everything that affects them, so
+# an edited note gets a fresh layout and pagination and drawing share one
+_layout_cache = OrderedDict()
+LAYOUT_CACHE_MAX = 5000
+# bump when wrapping or spacing changes so persisted note heights are recomputed
+LAYOUT_VERSION = 1
+# bump when drawing or encoding changes so cached page images are not reused
+RENDER_VERSION = 1
+
+
+def layout_hash(note):
+    techs = "\x1f".join(note.get("techniques") or ())
+    raw = f"{LAYOUT_VERSION}\x1e{_date_prefix(note)}\x1e{techs}\x1e{note.get('text', '')}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def _layout_key(note):
+    return note.get("id"), layout_hash(note)
+
+
+def note_layout(note):
+    key = _layout_key(note)
+    layout = _layout_cache.get(key)
+    if layout is not None:
+        _layout_cache.move_to_end(key)
+        return layout
+
     text = note.get("text", "")
     prefix = _date_prefix(note)
     fd = load_font(22, text=prefix)
     fb = load_font(28, text=text)
     dw = _measure_date_w(prefix, fd)
-    lines = _wrap_text(text, dw, fb)
+    lines = tuple(_wrap_text(text, dw, fb))
+
+    tech_text = ""
+    ft = None
     count = max(1, len(lines)) + 1
     if note.get("techniques"):
+        tech_text = "techniques: " + ", ".join(note["techniques"])
+        ft = load_font(20, text=tech_text)
         count += 2
-    return count * LS
+
+    layout = {
+        "prefix": prefix,
+        "date_font": fd,
+        "body_font": fb,
+        "date_w": dw,
+        "lines": lines,
+        "tech_text": tech_text,
+        "tech_font": ft,
+        "height": count * LS,
+    }
+    _layout_cache[key] = layout
+    if len(_layout_cache) > LAYOUT_CACHE_MAX:
+        _layout_cache.popitem(last=False)
+    return layout
 
 
-def _draw_page_bg(draw, h):
-    for y in range(0, h, GRID_SZ):
+def _note_height(note):
+    return note_layout(note)["height"]
+
+
+# grid paper is drawn once per height bucket and cropped, so a page only
+# draws its text
+BG_BUCKET = PAGE_H // 2
+
+
+@lru_cache(maxsize=8)
+def _background_tile(bucket_h):
+    img = Image.new("RGB", (PAGE_W, bucket_h), PAPER)
+    draw = ImageDraw.Draw(img)
+    for y in range(0, bucket_h, GRID_SZ):
         draw.line([(0, y), (PAGE_W, y)], fill=GRID_CLR, width=1)
     for x in range(0, PAGE_W, GRID_SZ):
-        draw.line([(x, 0), (x, h)], fill=GRID_CLR, width=1)
+        draw.line([(x, 0), (x, bucket_h)], fill=GRID_CLR, width=1)
+    return img
+
+
+def _new_page(h):
+    bucket_h = -(-h // BG_BUCKET) * BG_BUCKET
+    return _background_tile(bucket_h).crop((0, 0, PAGE_W, h))
 
 
 def _draw_note(draw, note, cy):
-    text = note.get("text", "")
-    prefix = _date_prefix(note)
-    fd = load_font(22, text=prefix)
-    fb = load_font(28, text=text)
-    dw = _measure_date_w(prefix, fd)
-    lines = _wrap_text(text, dw, fb)
+    layout = note_layout(note)
+    lines = layout["lines"]
 
-    if prefix:
-        draw.text((ML, cy), prefix + "  ", fill=DATE_CLR, font=fd)
+    if layout["prefix"]:
+        draw.text((ML, cy), layout["prefix"] + "  ", fill=DATE_CLR, font=layout["date_font"])
     if lines:
-        draw.text((ML + dw, cy), lines.pop(0), fill=INK, font=fb)
+        draw.text((ML + layout["date_w"], cy), lines[0], fill=INK, font=layout["body_font"])
     cy += LS
 
-    for line in lines:
+    for line in lines[1:]:
         if not line:
             cy += LS
             continue
-        draw.text((ML + (hash(line) % 3), cy), line, fill=INK, font=fb)
+        draw.text((ML + (hash(line) % 3), cy), line, fill=INK, font=layout["body_font"])
         cy += LS
 
-    if note.get("techniques"):
-        tech_text = "techniques: " + ", ".join(note["techniques"])
-        ft = load_font(20, text=tech_text)
+    if layout["tech_text"]:
         cy += LS
-        draw.text((ML, cy), tech_text, fill=INK_LIGHT, font=ft)
+        draw.text((ML, cy), layout["tech_text"], fill=INK_LIGHT, font=layout["tech_font"])
         cy += LS
 
     return cy + LS
@@ -147,19 +218,13 @@ def render_note_image(note_text, date_str="", time_str="", day_str="", technique
     note = {"text": note_text, "date": date_str, "time": time_str, "day": day_str, "techniques": techniques}
 
     h = max(PAGE_H, MT + _note_height(note) + 60)
-    img = Image.new("RGBA", (PAGE_W, h), PAPER + (255,))
+    img = _new_page(h)
     draw = ImageDraw.Draw(img)
-    _draw_page_bg(draw, h)
     _draw_note(draw, note, MT + 4)
-
-    buf = io.BytesIO()
-    img.convert("RGB").save(buf, format="PNG", optimize=True)
-    buf.seek(0)
-    buf.name = "training_note.png"
-    return buf
+    return image_encoder.encode(img, "training_note")
 
 
-def _header_height(goals, focus):
+def header_height(goals, focus):
     h = 0
     if goals:
         h += LS + len(goals) * LS + LS
@@ -196,54 +261,61 @@ def _draw_header(draw, goals, focus):
         cy += LS
         cy += LS
 
-    draw.line([(ML, cy - LS // 2), (PAGE_W - MR, cy - LS // 2)], fill=HEADER_LABEL + (60,), width=1)
+    draw.line([(ML, cy - LS // 2), (PAGE_W - MR, cy - LS // 2)], fill=HEADER_LABEL, width=1)
     return cy
 
 
-def render_notes_page(notes_list, goals=None, focus=None):
-    if not notes_list and not goals and not focus:
-        return []
-
-    hdr_h = _header_height(goals or [], focus)
+def paginate(heights, hdr_h=0, offset=0):
+    # returns (start, end, content_h) per page, from note heights alone. heights
+    # may be the tail of a journal from note index offset, which must then be a
+    # page boundary with no header above it
     limit = PAGE_H - 60
     pages = []
-    batch = []
+    start = offset
     batch_h = MT + hdr_h
 
-    for note in (notes_list or []):
-        nh = _note_height(note)
-        if batch and (batch_h + nh) > limit:
-            pages.append(batch)
-            batch = []
+    for i, nh in enumerate(heights, offset):
+        if i > start and (batch_h + nh) > limit:
+            pages.append((start, i, batch_h))
+            start = i
             batch_h = MT
-        batch.append(note)
         batch_h += nh
-    if batch:
-        pages.append(batch)
-    if not pages:
-        pages.append([])
-
-    buffers = []
-    for idx, page_notes in enumerate(pages):
-        extra = hdr_h if idx == 0 else 0
-        total = MT + extra + sum(_note_height(n) for n in page_notes) + 60
-        h = max(PAGE_H, total)
-        img = Image.new("RGBA", (PAGE_W, h), PAPER + (255,))
-        draw = ImageDraw.Draw(img)
-        _draw_page_bg(draw, h)
-
-        if idx == 0:
-            cy = _draw_header(draw, goals or [], focus)
-        else:
-            cy = MT + 4
+    if start < offset + len(heights):
+        pages.append((start, offset + len(heights), batch_h))
+    if not pages and offset == 0:
+        pages.append((0, 0, MT + hdr_h))
+    return pages
+
+
+def draw_page(page_notes, content_h, goals=None, focus=None, first=False):
+    h = max(PAGE_H, content_h + 60)
+    img = _new_page(h)
+    draw = ImageDraw.Draw(img)
+
+    if first:
+        cy = _draw_header(draw, goals or [], focus)
+    else:
+        cy = MT + 4
+
+    for n in page_notes:
+        cy = _draw_note(draw, n, cy)
+    return img
 
-        for n in page_notes:
-            cy = _draw_note(draw, n, cy)
 
-        buf = io.BytesIO()
-        img.convert("RGB").save(buf, format="PNG", optimize=True)
-        buf.seek(0)
-        buf.name = "training_notes.png"
-        buffers.append(buf)
+def render_page(page_notes, content_h, goals=None, focus=None, first=False):
+    img = draw_page(page_notes, content_h, goals, focus, first)
+    return image_encoder.encode(img, "training_notes")
+
+
+def render_notes_page(notes_list, goals=None, focus=None):
+    if not notes_list and not goals and not focus:
+        return []
+
+    notes_list = notes_list or []
+    hdr_h = header_height(goals or [], focus)
+    pages = paginate([_note_height(n) for n in notes_list], hdr_h)
 
-    return buffers
+    return [
+        render_page(notes_list[start:end], content_h, goals, focus, first=(idx == 0))
+        for idx, (start, end, content_h) in enumerate(pages)
+    ]
@@ -0,0 +1,146 @@
+from .note_image import LAYOUT_VERSION, layout_hash, note_layout, paginate, header_height
+from . import page_cache
+
+# note heights are persisted per user as {note_id: "layouthash:height"} and page
+# boundaries as db["note_pages"], so opening /notes reads stored integers, and
+# adding, editing or deleting a note only reflows from the page it is on.
+# stored boundaries are only trusted for the layout version, note count, last
+# note and header height they were computed for; anything else repaginates
+
+
+def _height_table(db):
+    return db.setdefault("note_heights", {})
+
+
+def record_note(db, note):
+    h = note_layout(note)["height"]
+    _height_table(db)[note["id"]] = f"{layout_hash(note)}:{h}"
+    return h
+
+
+def drop_note(db, note_id):
+    _height_table(db).pop(note_id, None)
+
+
+def reset(db):
+    # for imports and id backfills: boundaries are rebuilt on the next view
+    db.pop("note_pages", None)
+
+
+def note_heights(db, start=0):
+    # heights of notes[start:], re-measuring any note whose layout hash moved
+    table = _height_table(db)
+    notes = db.get("notes", [])
+    heights = []
+    changed = False
+    for note in notes[start:]:
+        cached = table.get(note.get("id"))
+        h = None
+        if cached:
+            digest, _, value = cached.partition(":")
+            if digest == layout_hash(note):
+                h = int(value)
+        if h is None:
+            h = record_note(db, note)
+            changed = True
+        heights.append(h)
+
+    if start == 0 and len(table) > len(notes):
+        live = {n.get("id") for n in notes}
+        for note_id in [k for k in table if k not in live]:
+            del table[note_id]
+        changed = True
+    return heights, changed
+
+
+def _header(db):
+    goals = [g for g in db.get("goals", []) if g.get("status") == "active"]
+    return goals, db.get("active_drill")
+
+
+def _last_id(db):
+    notes = db.get("notes", [])
+    return notes[-1].get("id") if notes else None
+
+
+def _store_pages(db, bounds, hdr_h):
+    db["note_pages"] = {
+        "layout": LAYOUT_VERSION,
+        "header": hdr_h,
+        "count": len(db.get("notes", [])),
+        "last": _last_id(db),
+        "bounds": [list(b) for b in bounds],
+    }
+
+
+def _valid(db, state):
+    return (
+        state is not None
+        and state.get("layout") == LAYOUT_VERSION
+        and state.get("count") == len(db.get("notes", []))
+        and state.get("last") == _last_id(db)
+    )
+
+
+def page_bounds(db, goals, focus):
+    hdr_h = header_height(goals or [], focus)
+    state = db.get("note_pages")
+    if _valid(db, state) and state.get("header") == hdr_h:
+        return [tuple(b) for b in state["bounds"]], False
+
+    heights, _ = note_heights(db)
+    bounds = paginate(heights, hdr_h)
+    _store_pages(db, bounds, hdr_h)
+    return bounds, True
+
+
+def _page_of(bounds, index):
+    # the page notes[index] was on; a note that opened its page may now fit on
+    # the one before, so reflow starts there instead
+    for page, (start, end, _) in enumerate(bounds):
+        if index < end:
+            return page - 1 if index == start and page > 0 else page
+    return max(0, len(bounds) - 1)
+
+
+def reflow_from(db, index):
+    # call after notes[index] was added, edited or removed and its height recorded
+    state = db.get("note_pages")
+    if not state:
+        return
+    if state.get("layout") != LAYOUT_VERSION:
+        # boundaries from another layout cannot be partly reused
+        reset(db)
+        return
+    goals, focus = _header(db)
+    hdr_h = header_height(goals, focus)
+    old = [tuple(b) for b in state["bounds"]]
+    page = _page_of(old, index) if hdr_h == state.get("header") else 0
+
+    keep = old[:page]
+    offset = keep[-1][1] if keep else 0
+    heights, _ = note_heights(db, offset)
+    _store_pages(db, keep + paginate(heights, hdr_h if not keep else 0, offset), hdr_h)
+
+
+def page_keys(db, bounds, goals, focus):
+    # cache key per page from the stored layout hashes; call after page_bounds
+    table = _height_table(db)
+    notes = db.get("notes", [])
+    header = page_cache.header_digest(goals, focus)
+    keys = []
+    for idx, (start, end, content_h) in enumerate(bounds):
+        digests = [table.get(n.get("id"), "").partition(":")[0] for n in notes[start:end]]
+        keys.append(page_cache.page_key(digests, content_h, header if idx == 0 else ""))
+    return keys
+
+
+def current_page_keys(db):
+    goals, focus = _header(db)
+    bounds, _ = page_bounds(db, goals, focus)
+    return page_keys(db, bounds, goals, focus)
+
+
+def drop_stale_pages(db, before):
+    # after an edit or delete, only pages whose content changed get new keys
+    page_cache.discard(set(before) - set(current_page_keys(db)))
@@ -0,0 +1,218 @@
+import io
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+from telegram.error import BadRequest
+
+from .database import data_directory
+from . import note_image
+from . import image_encoder
+
+logger = logging.getLogger(__name__)
+
+# rendered images are stored by a hash of everything drawn on them, so a
+# page that has not changed is neither rendered nor uploaded again; once
+# telegram has the photo we keep its file_id and send that instead of bytes
+cache_directory = data_directory / "page_cache"
+index_file = cache_directory / "index.json"
+max_bytes = 64 * 1024 * 1024
+# index changes are written at most this often; evictions and shutdown write
+# at once. a lost write only costs re-uploads, files are checked on load
+save_delay = 5.0
+
+# key -> {"size": bytes on disk, "file_id": telegram id or None, "format":
+# image_encoder format name}, oldest first
+_index = None
+_dirty = False
+_flush_handle = None
+
+
+def _load_index():
+    global _index
+    if _index is not None:
+        return _index
+    _index = OrderedDict()
+    if index_file.exists():
+        current = image_encoder.format_name()
+        stale = []
+        try:
+            with open(index_file, "r") as f:
+                for key, entry in json.load(f):
+                    if not (cache_directory / f"{key}.img").exists():
+                        continue
+                    # entries from another encoder (or from before formats were
+                    # recorded) can never be hit again, their keys differ
+                    if entry.get("format") != current:
+                        stale.append(key)
+                        continue
+                    _index[key] = entry
+        except (json.JSONDecodeError, ValueError, TypeError, AttributeError):
+            logger.warning("page cache index unreadable, starting empty")
+        for key in stale:
+            (cache_directory / f"{key}.img").unlink(missing_ok=True)
+        if stale:
+            logger.info("dropped %d cached images from other formats", len(stale))
+            _write_index()
+    return _index
+
+
+def _write_index():
+    cache_directory.mkdir(exist_ok=True)
+    tmp = index_file.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(list(_load_index().items()), f)
+    os.replace(tmp, index_file)
+
+
+def flush():
+    # writes pending index changes now; called on eviction and at shutdown
+    global _dirty, _flush_handle
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    if _dirty:
+        _dirty = False
+        _write_index()
+
+
+def _save_index():
+    global _dirty, _flush_handle
+    _dirty = True
+    if _flush_handle is not None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # scripts and benchmarks without a loop write straight away
+        flush()
+        return
+    _flush_handle = loop.call_later(save_delay, flush)
+
+
+def page_key(note_digests, content_h, header=""):
+    raw = "\x1e".join([
+        f"{note_image.LAYOUT_VERSION}.{note_image.RENDER_VERSION}",
+        f"{note_image.PAGE_W}x{note_image.PAGE_H}",
+        image_encoder.signature(),
+        str(content_h),
+        header,
+        "\x1f".join(note_digests),
+    ])
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def header_digest(goals, focus):
+    # the header only shows the first three goals and the focus technique
+    if not goals and not focus:
+        return ""
+    parts = [f"{g.get('status', '')}\x1f{g.get('goals', '')}" for g in (goals or [])[:3]]
+    parts.append(focus.get("technique", "") if focus else "")
+    return "\x1d".join(parts)
+
+
+def contains(key):
+    return key in _load_index()
+
+
+def cached_photo(key, stem="training_notes"):
+    # file_id if telegram already has the page, else the stored image, else None
+    index = _load_index()
+    entry = index.get(key)
+    if entry is None:
+        return None
+    index.move_to_end(key)
+    if entry.get("file_id"):
+        return entry["file_id"]
+    path = cache_directory / f"{key}.img"
+    try:
+        data = path.read_bytes()
+    except OSError:
+        index.pop(key, None)
+        return None
+    buf = io.BytesIO(data)
+    buf.name = image_encoder.file_name(stem, entry["format"])
+    return buf
+
+
+def store(key, buf):
+    index = _load_index()
+    data = buf.getvalue()
+    cache_directory.mkdir(exist_ok=True)
+    (cache_directory / f"{key}.img").write_bytes(data)
+    index[key] = {"size": len(data), "file_id": None, "format": image_encoder.format_name()}
+    index.move_to_end(key)
+    if _evict():
+        _save_index()
+        flush()
+    else:
+        _save_index()
+
+
+def remember_file_id(key, file_id):
+    entry = _load_index().get(key)
+    if entry is None or entry.get("file_id") == file_id:
+        return
+    entry["file_id"] = file_id
+    _save_index()
+
+
+def forget_file_id(key):
+    entry = _load_index().get(key)
+    if entry is not None and entry.get("file_id"):
+        entry["file_id"] = None
+        _save_index()
+
+
+def _remove(key):
+    _load_index().pop(key, None)
+    (cache_directory / f"{key}.img").unlink(missing_ok=True)
+
+
+def _evict():
+    # returns whether anything was removed
+    index = _load_index()
+    total = sum(e.get("size", 0) for e in index.values())
+    removed = False
+    while total > max_bytes and len(index) > 1:
+        key, entry = next(iter(index.items()))
+        total -= entry.get("size", 0)
+        _remove(key)
+        removed = True
+    return removed
+
+
+def discard(keys):
+    keys = [k for k in keys if k in _load_index()]
+    if not keys:
+        return
+    for key in keys:
+        _remove(key)
+    _save_index()
+
+
+async def cached_or_render(key, render, stem="training_notes"):
+    # file_id or image bytes for key, rendering it only on a cache miss
+    photo = cached_photo(key, stem)
+    if photo is None:
+        photo = await render()
+        store(key, photo)
+    return photo
+
+
+async def reply_cached(target, key, render, stem="training_notes", **kwargs):
+    photo = await cached_or_render(key, render, stem)
+    if isinstance(photo, str):
+        try:
+            await target.reply_photo(photo=photo, **kwargs)
+            return
+        except BadRequest:
+            # the file_id is no longer valid for this bot, upload the bytes again
+            forget_file_id(key)
+            photo = await cached_or_render(key, render, stem)
+    sent = await target.reply_photo(photo=photo, **kwargs)
+    if sent is not None and sent.photo:
+        remember_file_id(key, sent.photo[-1].file_id)
@@ -0,0 +1,78 @@
+import os
+
+from .database import load_database, user_file
+
+# ready-to-send pretraining recaps, so the reminder slot only sends a string
+# instead of loading and formatting every member's file in the same minute.
+# each recap remembers the mtime of the user file it was built from; a write
+# makes it stale and it is rebuilt the next time it is asked for, usually by
+# the warm-up pass ahead of the slot. recaps are only kept for users with a
+# training schedule
+# chat_id -> (user file mtime, recap)
+_recaps = {}
+
+
+def build_recap(database):
+    notes = database.get("notes", [])
+    last_note = notes[-1] if notes else None
+
+    active_goals = [g for g in database.get("goals", []) if g.get("status", "active") == "active"]
+    active_drill = database.get("active_drill")
+
+    message = "*pretraining recap*\n\n"
+
+    if active_goals:
+        message += "*your goals:*\n"
+        for g in active_goals[:3]:
+            message += f"  {g['goals']}\n"
+        message += "\n"
+
+    if last_note:
+        message += f"*last session ({last_note['date']}):*\n"
+        preview = last_note["text"][:300]
+        if len(last_note["text"]) > 300:
+            preview += "..."
+        message += f"{preview}\n\n"
+
+    if active_drill:
+        message += (
+            f"*focus technique:* {active_drill['technique']}\n"
+            f"_{active_drill.get('description', '')}_\n\n"
+        )
+
+    if not active_goals and not last_note and not active_drill:
+        message += "no notes or goals yet, focus on learning today!\n"
+
+    message += "have a great session! pay attention during demonstrations."
+    return message
+
+
+def _mtime(chat_id):
+    try:
+        return os.stat(user_file(chat_id)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def fresh(chat_id):
+    entry = _recaps.get(chat_id)
+    return entry is not None and entry[0] == _mtime(chat_id)
+
+
+def get(chat_id):
+    # the recap for chat_id, rebuilt from the user file if it changed since
+    entry = _recaps.get(chat_id)
+    mtime = _mtime(chat_id)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+    database = load_database(chat_id)
+    message = build_recap(database)
+    if database.get("schedule"):
+        _recaps[chat_id] = (mtime, message)
+    else:
+        _recaps.pop(chat_id, None)
+    return message
+
+
+def size():
+    return len(_recaps)
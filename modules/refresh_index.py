@@ -0,0 +1,102 @@
+import heapq
+from datetime import date, timedelta
+
+from . import job_store
+
+# spaced repetition refreshes for every user in one min-heap of
+# (due_date, chat_id, goal_id, refresh_index), so the daily sweep only touches
+# users that have something due. entries are never removed from the heap; an
+# entry is live only while it matches _live for its goal. live entries are
+# mirrored to job_store so a restart reloads them without reading user files
+_heap = []
+# (chat_id, goal_id) -> (due_date, refresh_index) of the goal's live entry
+_live = {}
+# chat_id -> goal ids with a live entry, so reindexing one user stays cheap
+_user_goals = {}
+_indexed = set()
+
+# an unanswered refresh is asked again after this many days
+renag_days = 7
+
+
+def _next_due(goal):
+    if goal.get("status") != "completed":
+        return None
+    schedule = goal.get("refresh_schedule", [])
+    idx = goal.get("refresh_index", 0)
+    if idx >= len(schedule):
+        return None
+    return schedule[idx], idx
+
+
+def _push(chat_id, goal_id, due, idx):
+    _live[(chat_id, goal_id)] = (due, idx)
+    _user_goals.setdefault(chat_id, set()).add(goal_id)
+    heapq.heappush(_heap, (due, chat_id, goal_id, idx))
+
+
+def track_goal(chat_id, goal):
+    # call whenever a goal is completed, refreshed or removed
+    key = (chat_id, goal.get("id"))
+    nxt = _next_due(goal)
+    if nxt is None:
+        if _live.pop(key, None) is not None:
+            job_store.drop_refresh([key])
+        _user_goals.get(chat_id, set()).discard(goal.get("id"))
+    elif _live.get(key) != nxt:
+        _push(chat_id, goal.get("id"), *nxt)
+        job_store.put_refresh([(chat_id, goal.get("id"), *nxt)])
+
+
+def index_user(chat_id, db):
+    # replaces everything indexed for chat_id with the goals in db
+    dropped = [(chat_id, goal_id) for goal_id in _user_goals.pop(chat_id, ())]
+    for key in dropped:
+        _live.pop(key, None)
+    job_store.drop_refresh(dropped)
+    _indexed.add(chat_id)
+    for goal in db.get("goals", []):
+        track_goal(chat_id, goal)
+
+
+def ensure_user(chat_id, db):
+    if chat_id not in _indexed:
+        index_user(chat_id, db)
+
+
+def restore():
+    # loads the live entries saved by job_store; returns the chat ids restored
+    for chat_id, goal_id, due, idx in job_store.load_refresh():
+        _push(chat_id, goal_id, due, idx)
+        _indexed.add(chat_id)
+    return set(_user_goals)
+
+
+def pop_due(today):
+    # {chat_id: [(goal_id, refresh_index)]} for live entries due on or before
+    # today; each is pushed back renag_days out in case it goes unanswered
+    due = {}
+    again = (date.fromisoformat(today) + timedelta(days=renag_days)).isoformat()
+    pushed = []
+    while _heap and _heap[0][0] <= today:
+        when, chat_id, goal_id, idx = heapq.heappop(_heap)
+        if _live.get((chat_id, goal_id)) != (when, idx):
+            continue
+        due.setdefault(chat_id, []).append((goal_id, idx))
+        pushed.append((chat_id, goal_id, again, idx))
+    for entry in pushed:
+        _push(*entry)
+    job_store.put_refresh(pushed)
+    return due
+
+
+def pending():
+    return len(_live)
+
+
+def compact():
+    # drops dead entries once they outnumber live ones
+    global _heap
+    if len(_heap) > 2 * len(_live) + 64:
+        _heap = [(due, c, g, i) for (c, g), (due, i) in _live.items()]
+        heapq.heapify(_heap)
@@ -1,122 +1,344 @@
-from datetime import datetime, time, timedelta
+import asyncio
+import logging
+from datetime import datetime, time, timedelta, timezone
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from .database import load_database, save_database
-from .helpers import now_se, time_se, SE_TZ
+from .database import load_database, save_database, data_directory
+from .helpers import now_se, time_se, zone, user_tz_name, default_tz_name
+from .dispatcher import bulk_args
+from . import refresh_index
+from . import job_store
+from . import recap_cache
+from . import scheduler_metrics
 
+logger = logging.getLogger(__name__)
 
-async def send_pretraining_recap(context: ContextTypes.DEFAULT_TYPE):
-    chat_id = context.job.chat_id
-    database = load_database(chat_id)
-
-    notes = database.get("notes", [])
-    last_note = notes[-1] if notes else None
-
-    active_goals = [g for g in database.get("goals", []) if g.get("status", "active") == "active"]
-    active_drill = database.get("active_drill")
-
-    message = "*pretraining recap*\n\n"
-
-    if active_goals:
-        message += "*your goals:*\n"
-        for g in active_goals[:3]:
-            message += f"  {g['goals']}\n"
-        message += "\n"
-
-    if last_note:
-        message += f"*last session ({last_note['date']}):*\n"
-        preview = last_note["text"][:300]
-        if len(last_note["text"]) > 300:
-            preview += "..."
-        message += f"{preview}\n\n"
 
-    if active_drill:
-        message += (
-            f"*focus technique:* {active_drill['technique']}\n"
-            f"_{active_drill.get('description', '')}_\n\n"
-        )
-
-    if not active_goals and not last_note and not active_drill:
-        message += "no notes or goals yet, focus on learning today!\n"
-
-    message += "have a great session! pay attention during demonstrations."
-
-    await context.bot.send_message(
+async def send_pretraining_recap(bot, chat_id):
+    message = recap_cache.get(chat_id)
+    await bot.send_message(
         chat_id=chat_id,
         text=message,
         parse_mode="Markdown",
+        **bulk_args(bot),
     )
 
 
-async def send_posttraining_note_reminder(context: ContextTypes.DEFAULT_TYPE):
-    chat_id = context.job.chat_id
-    await context.bot.send_message(
+async def send_posttraining_note_reminder(bot, chat_id):
+    await bot.send_message(
         chat_id=chat_id,
         text="how was training? use /note to write down what you learned today.",
+        **bulk_args(bot),
+    )
+
+
+async def send_daily_checkin(bot, chat_id):
+    keyboard = [[
+        InlineKeyboardButton("🥋 trained", callback_data="checkin_yes"),
+        InlineKeyboardButton("😴 rest day", callback_data="checkin_no"),
+    ]]
+    await bot.send_message(
+        chat_id=chat_id,
+        text="did you train today?",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        **bulk_args(bot),
     )
 
 
-async def send_refresh_reminders(context: ContextTypes.DEFAULT_TYPE):
-    chat_id = context.job.chat_id
+async def send_refresh_reminders(bot, chat_id, due):
+    # due is [(goal_id, refresh_index)] from the refresh index
     database = load_database(chat_id)
-    today = now_se().strftime("%Y-%m-%d")
+    goals = {g.get("id"): g for g in database.get("goals", [])}
 
-    for goal in database.get("goals", []):
-        if goal.get("status") != "completed":
+    for goal_id, idx in due:
+        goal = goals.get(goal_id)
+        if goal is None or goal.get("status") != "completed" or goal.get("refresh_index", 0) != idx:
             continue
 
-        schedule = goal.get("refresh_schedule", [])
-        idx = goal.get("refresh_index", 0)
+        labels = ["1 month", "2 months", "3 months", "6 months"]
+        label = labels[idx] if idx < len(labels) else f"reminder {idx + 1}"
 
-        if idx >= len(schedule):
-            continue
+        keyboard = [[InlineKeyboardButton(
+            "got it, refreshed",
+            callback_data=f"goal_refresh_{goal['id']}",
+        )]]
 
-        if schedule[idx] <= today:
-            labels = ["1 month", "2 months", "3 months", "6 months"]
-            label = labels[idx] if idx < len(labels) else f"reminder {idx + 1}"
-
-            from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-            keyboard = [[InlineKeyboardButton(
-                "got it, refreshed",
-                callback_data=f"goal_refresh_{goal['id']}",
-            )]]
-
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=(
-                    f"*refresh reminder ({label})*\n\n"
-                    f"remember this goal?\n"
-                    f"*{goal['goals']}*\n\n"
-                    f"_take a moment to drill or think about this today_"
-                ),
-                parse_mode="Markdown",
-                reply_markup=InlineKeyboardMarkup(keyboard),
-            )
+        await bot.send_message(
+            chat_id=chat_id,
+            text=(
+                f"*refresh reminder ({label})*\n\n"
+                f"remember this goal?\n"
+                f"*{goal['goals']}*\n\n"
+                f"_take a moment to drill or think about this today_"
+            ),
+            parse_mode="Markdown",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            **bulk_args(bot),
+        )
 
 
 DAY_MAP = {
     "Sunday": 0, "Monday": 1, "Tuesday": 2, "Wednesday": 3,
     "Thursday": 4, "Friday": 5, "Saturday": 6,
 }
+day_names = {num: name[:3] for name, num in DAY_MAP.items()}
+
+
+# a slot is (kind, time zone, weekday, "HH:MM") in the user's local time.
+# slots are hung on timers keyed by the UTC weekday and minute they next fire
+# at, so one job serves every slot, in any zone, that lands on the same
+# minute. after a timer fires each of its slots is re-hung by its next local
+# occurrence, which is how DST moves a slot to another timer without touching
+# the users in it. schedule changes only move chat ids between slots
+senders = {
+    "pretrain": send_pretraining_recap,
+    "posttrain": send_posttraining_note_reminder,
+    "checkin": send_daily_checkin,
+}
+slot_batch_size = 25
+refresh_hour = 10
+
+# how each reminder kind shows up on the app map
+kind_labels = {
+    "pretrain": "pretraining recap (1h before)",
+    "posttrain": "note prompt (1h after)",
+    "checkin": "daily check in (did you train?)",
+    "refresh": f"goal refreshes ({refresh_hour}:00 on the due day)",
+}
+
+# how late a slot that fell due while the bot was down may still be sent on
+# startup; a recap after class has started is no use, a note prompt still is
+misfire_grace = {
+    "pretrain": timedelta(minutes=45),
+    "posttrain": timedelta(hours=6),
+    "checkin": timedelta(hours=3),
+}
+# recaps missing from recap_cache (after a restart) or stale (after a write)
+# are built this far ahead of their slot by a background pass, a few users at
+# a time
+recap_warm_ahead = timedelta(minutes=20)
+recap_warm_interval = 300
+
+# (kind, tz, day, "HH:MM") -> chat ids due in that slot
+_slots = {}
+# chat_id -> slots the chat is in, so rescheduling one user is O(their slots)
+_user_slots = {}
+# (utc day, "HH:MM") -> slots that fire at that UTC minute, and its job
+_timers = {}
+_timer_jobs = {}
+# slot -> the timer it hangs on
+_slot_timer = {}
+
+
+async def _fan_out(kind, calls):
+    # calls is [(chat_id, coroutine function)], sent in gathered batches
+    failed = 0
+    for i in range(0, len(calls), slot_batch_size):
+        batch = calls[i:i + slot_batch_size]
+        results = await asyncio.gather(*(call() for _, call in batch), return_exceptions=True)
+        for (chat_id, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                failed += 1
+                logger.warning("%s reminder for %s failed: %s", kind, chat_id, result)
+    scheduler_metrics.record_sends(kind, len(calls) - failed, failed)
+
+
+def _next_occurrence(slot, after):
+    # next time the slot fires strictly after `after` (an aware datetime)
+    _, tz_name, day, hhmm = slot
+    tz = zone(tz_name)
+    hour, minute = (int(x) for x in hhmm.split(":"))
+    after = after.astimezone(tz)
+    ahead = (day - (after.weekday() + 1)) % 7
+    when = datetime.combine(after.date() + timedelta(days=ahead), time(hour, minute), tzinfo=tz)
+    if when <= after:
+        when = datetime.combine(when.date() + timedelta(days=7), time(hour, minute), tzinfo=tz)
+    return when
+
+
+def _timer_key(when):
+    when = when.astimezone(timezone.utc)
+    return (when.weekday() + 1) % 7, f"{when.hour:02d}:{when.minute:02d}"
+
+
+def _hang(job_queue, slot, now):
+    key = _timer_key(_next_occurrence(slot, now))
+    old = _slot_timer.get(slot)
+    if old == key:
+        return
+    if old is not None:
+        _unhang(slot)
+    _slot_timer[slot] = key
+    _timers.setdefault(key, set()).add(slot)
+    if key not in _timer_jobs:
+        day, hhmm = key
+        hour, minute = (int(x) for x in hhmm.split(":"))
+        _timer_jobs[key] = job_queue.run_daily(
+            _run_timer,
+            time=time(hour, minute, tzinfo=timezone.utc),
+            days=(day,),
+            data=key,
+            name=f"timer_{day}_{hhmm}",
+        )
 
 
-def _clear_jobs(job_queue, prefix):
-    for job in job_queue.jobs():
-        if job.name and job.name.startswith(prefix):
+def _unhang(slot):
+    key = _slot_timer.pop(slot, None)
+    slots = _timers.get(key)
+    if slots is None:
+        return
+    slots.discard(slot)
+    if not slots:
+        del _timers[key]
+        job = _timer_jobs.pop(key, None)
+        if job is not None:
             job.schedule_removal()
 
 
-def schedule_training_reminders(job_queue, chat_id):
-    _clear_jobs(job_queue, f"pretrain_{chat_id}_")
-    _clear_jobs(job_queue, f"posttrain_{chat_id}_")
+async def _fire(context, slots):
+    bot = context.bot
+    now = now_se()
+    calls = {}
+    # bookkeeping first, so a crash mid-send is not replayed on the next start
+    with job_store.batch():
+        for slot in slots:
+            job_store.set_next_run(slot, _next_occurrence(slot, now))
+            if slot in _slots:
+                _hang(context.job_queue, slot, now)
+            send = senders[slot[0]]
+            for c in _slots.get(slot, ()):
+                calls.setdefault(slot[0], []).append((c, lambda c=c, send=send: send(bot, c)))
+    for kind, batch in calls.items():
+        await _fan_out(kind, batch)
 
-    database = load_database(chat_id)
+
+@scheduler_metrics.counted
+async def _run_timer(context: ContextTypes.DEFAULT_TYPE):
+    await _fire(context, list(_timers.get(context.job.data, ())))
+
+
+@scheduler_metrics.counted
+async def _run_missed(context: ContextTypes.DEFAULT_TYPE):
+    await _fire(context, context.job.data)
+
+
+@scheduler_metrics.counted
+async def _refresh_sweep(context: ContextTypes.DEFAULT_TYPE):
+    bot = context.bot
+    today = now_se().strftime("%Y-%m-%d")
+    due = refresh_index.pop_due(today)
+    job_store.set_meta("refresh_swept", today)
+    await _fan_out("refresh", [(c, lambda c=c, d=d: send_refresh_reminders(bot, c, d)) for c, d in due.items()])
+    refresh_index.compact()
+
+
+@scheduler_metrics.counted
+async def _warm_recaps(context: ContextTypes.DEFAULT_TYPE):
+    now = now_se()
+    built = 0
+    for slot, members in list(_slots.items()):
+        if slot[0] != "pretrain" or _next_occurrence(slot, now) - now > recap_warm_ahead:
+            continue
+        for chat_id in list(members):
+            if recap_cache.fresh(chat_id):
+                continue
+            try:
+                recap_cache.get(chat_id)
+            except Exception as e:
+                logger.warning("could not build recap for %s: %s", chat_id, e)
+            built += 1
+            # hand the loop back between users so replies are not held up
+            if built % slot_batch_size == 0:
+                await asyncio.sleep(0)
+
+
+def _join_slot(job_queue, chat_id, slot):
+    members = _slots.setdefault(slot, set())
+    members.add(chat_id)
+    _user_slots.setdefault(chat_id, set()).add(slot)
+    if slot not in _slot_timer:
+        now = now_se()
+        _hang(job_queue, slot, now)
+        job_store.set_next_run(slot, _next_occurrence(slot, now))
+
+
+def _leave_slot(chat_id, slot):
+    slots = _user_slots.get(chat_id)
+    if slots is not None:
+        slots.discard(slot)
+        if not slots:
+            del _user_slots[chat_id]
+    members = _slots.get(slot)
+    if members is None:
+        return
+    members.discard(chat_id)
+    if not members:
+        del _slots[slot]
+        job_store.drop_slot(slot)
+        _unhang(slot)
+
+
+def _set_slots(job_queue, chat_id, kinds, wanted):
+    current = {s for s in _user_slots.get(chat_id, ()) if s[0] in kinds}
+    leaving, joining = current - wanted, wanted - current
+    if not leaving and not joining:
+        return
+    with job_store.batch():
+        job_store.remove_members([(slot, chat_id) for slot in leaving])
+        for slot in leaving:
+            _leave_slot(chat_id, slot)
+        for slot in joining:
+            _join_slot(job_queue, chat_id, slot)
+        job_store.add_members([(slot, chat_id) for slot in joining])
+
+
+def reminder_kinds():
+    # every kind that has a sender, plus the daily refresh sweep
+    return [kind_labels[kind] for kind in (*senders, "refresh")]
+
+
+def user_slots(chat_id):
+    return sorted(_user_slots.get(chat_id, ()))
+
+
+def slot_summary(top=10):
+    # slot and member counts per kind and the busiest UTC timers, for metrics
+    kinds = {}
+    for slot, members in _slots.items():
+        kind = kinds.setdefault(slot[0], {"slots": 0, "members": 0})
+        kind["slots"] += 1
+        kind["members"] += len(members)
+
+    timers = []
+    for (day, hhmm), slots in _timers.items():
+        members = sum(len(_slots.get(s, ())) for s in slots)
+        timers.append((members, day, hhmm, len(slots)))
+    timers.sort(reverse=True)
+
+    return {
+        "timers": len(_timers),
+        "kinds": kinds,
+        "hottest": [
+            {"utc": f"{day_names[day]} {hhmm}", "members": members, "slots": count}
+            for members, day, hhmm, count in timers[:top]
+        ],
+    }
+
+
+def schedule_training_reminders(job_queue, chat_id, database=None):
+    if database is None:
+        database = load_database(chat_id)
     schedule = database.get("schedule", [])
     reminders_off = database.get("reminders_disabled", False)
 
+    kinds = ("pretrain", "posttrain", "checkin")
     if reminders_off:
+        _set_slots(job_queue, chat_id, kinds, set())
         return
 
+    tz_name = user_tz_name(database)
+    wanted = set()
     for entry in schedule:
         day_name = entry["day"]
         time_str = entry["time"]
@@ -135,38 +357,102 @@ def schedule_training_reminders(job_queue, chat_id):
         pre_dt = train_dt - timedelta(hours=1)
         post_dt = train_dt + timedelta(hours=1)
 
-        job_queue.run_daily(
-            send_pretraining_recap,
-            time=time_se(pre_dt.hour, pre_dt.minute),
-            days=(day_num,),
-            chat_id=chat_id,
-            name=f"pretrain_{chat_id}_{day_name}_{time_str}",
-        )
+        wanted.add(("pretrain", tz_name, day_num, f"{pre_dt.hour:02d}:{pre_dt.minute:02d}"))
+        wanted.add(("posttrain", tz_name, day_num, f"{post_dt.hour:02d}:{post_dt.minute:02d}"))
 
-        job_queue.run_daily(
-            send_posttraining_note_reminder,
-            time=time_se(post_dt.hour, post_dt.minute),
-            days=(day_num,),
-            chat_id=chat_id,
-            name=f"posttrain_{chat_id}_{day_name}_{time_str}",
-        )
+    # the daily check-in asks everyone with a schedule, training day or not
+    checkin_at = database.get("reminder_times", {}).get("daily_checkin", "20:00")
+    try:
+        hour, minute = (int(x) for x in checkin_at.split(":"))
+        checkin_at = f"{hour:02d}:{minute:02d}"
+    except ValueError:
+        checkin_at = "20:00"
+    if wanted:
+        for day_num in DAY_MAP.values():
+            wanted.add(("checkin", tz_name, day_num, checkin_at))
 
+    _set_slots(job_queue, chat_id, kinds, wanted)
+
+
+_sweep_job = None
+_warm_job = None
 
-def schedule_refresh_job(job_queue, chat_id):
-    name = f"refresh_{chat_id}"
-    _clear_jobs(job_queue, name)
-    job_queue.run_daily(
-        send_refresh_reminders,
-        time=time_se(10, 0),
-        days=(1,),
-        chat_id=chat_id,
-        name=name,
-    )
+
+def schedule_refresh_sweep(job_queue):
+    # one job a day for every user's refresh reminders, fed by refresh_index,
+    # and one repeating pass that builds recaps ahead of upcoming slots
+    global _sweep_job, _warm_job
+    if _sweep_job is None:
+        _sweep_job = job_queue.run_daily(_refresh_sweep, time=time_se(refresh_hour, 0), name="refresh_sweep")
+    if _warm_job is None:
+        _warm_job = job_queue.run_repeating(_warm_recaps, interval=recap_warm_interval, first=5, name="recap_warm")
 
 
 def schedule_all_reminders(chat_id, job_queue):
-    schedule_training_reminders(job_queue, chat_id)
-    schedule_refresh_job(job_queue, chat_id)
+    database = load_database(chat_id)
+    schedule_training_reminders(job_queue, chat_id, database)
+    refresh_index.ensure_user(chat_id, database)
+    schedule_refresh_sweep(job_queue)
+
+
+def _seed_from_user_files(job_queue):
+    # first start with an empty job store: build it from the user files once,
+    # in a single commit
+    with job_store.batch():
+        for f in data_directory.glob("user_*.json"):
+            try:
+                chat_id = int(f.stem.replace("user_", ""))
+                schedule_all_reminders(chat_id, job_queue)
+            except Exception as e:
+                logger.warning("could not schedule reminders from %s: %s", f.name, e)
+        job_store.set_meta("seeded", now_se().isoformat())
+
+
+def restore_reminders(job_queue):
+    # called once at startup. loads slots and refresh entries from the job
+    # store and queues a catch-up run for anything that fell due while the
+    # bot was down and is still within its misfire grace
+    if job_store.get_meta("seeded") is None:
+        _seed_from_user_files(job_queue)
+    else:
+        now = now_se()
+        runs = job_store.next_runs()
+        missed = []
+        with job_store.batch():
+            for slot, members in job_store.load_slots().items():
+                due = runs.get(slot)
+                if len(slot) == 3:
+                    # stored before slots carried a time zone
+                    job_store.drop_slot(slot)
+                    slot = (slot[0], default_tz_name, slot[1], slot[2])
+                    job_store.add_members([(slot, chat_id) for chat_id in members])
+                _slots[slot] = members
+                for chat_id in members:
+                    _user_slots.setdefault(chat_id, set()).add(slot)
+                _hang(job_queue, slot, now)
+
+                due = datetime.fromisoformat(due) if due else None
+                if due is not None and due > now:
+                    continue
+                if due is not None:
+                    late = now - due
+                    if late <= misfire_grace.get(slot[0], timedelta(0)):
+                        logger.info("slot %s missed by %s, sending now", slot, late)
+                        scheduler_metrics.record_catchup(slot[0], True)
+                        missed.append(slot)
+                        continue
+                    logger.info("slot %s missed by %s, skipped", slot, late)
+                    scheduler_metrics.record_catchup(slot[0], False)
+                job_store.set_next_run(slot, _next_occurrence(slot, now))
+        if missed:
+            job_queue.run_once(_run_missed, when=0, data=missed, name="slots_misfire")
+        refresh_index.restore()
+    schedule_refresh_sweep(job_queue)
+
+    # refresh entries are by date, so one late sweep catches up every missed day
+    now = now_se()
+    if job_store.get_meta("refresh_swept", "") < now.strftime("%Y-%m-%d") and now.hour >= refresh_hour:
+        job_queue.run_once(_refresh_sweep, when=0, name="refresh_sweep_misfire")
 
 
 async def setup_reminders(update, context):
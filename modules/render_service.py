@@ -0,0 +1,84 @@
+import os
+import asyncio
+import logging
+import functools
+from concurrent.futures import ProcessPoolExecutor
+
+from . import note_image
+from . import app_map
+
+logger = logging.getLogger(__name__)
+
+# pillow drawing and png encoding are cpu bound, so they run in worker
+# processes; until start() is called (tests, scripts) everything renders inline
+default_workers = 2
+default_queue = 16
+# seconds a render may wait for a free slot before giving up
+default_wait = 20
+
+_pool = None
+_slots = None
+_wait = default_wait
+
+
+class RenderBusy(Exception):
+    # every worker is busy and the queue is full; the caller should ask the
+    # user to try again rather than wait indefinitely
+    pass
+
+
+def _env_int(name, default):
+    try:
+        return max(0, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def _warm():
+    # pool initializer, runs once in each worker so the first render does not pay for font loading
+    for size in (20, 22, 28):
+        note_image.load_font(size)
+        note_image.load_font(size, text="ж")
+    for size in (20, 24, 32):
+        app_map.load_font(size)
+
+
+def start(workers=None, queue_size=None, wait=None):
+    global _pool, _slots, _wait
+    if _pool is not None:
+        return
+    workers = _env_int("RENDER_WORKERS", default_workers) if workers is None else workers
+    queue_size = _env_int("RENDER_QUEUE", default_queue) if queue_size is None else queue_size
+    _wait = _env_int("RENDER_WAIT", default_wait) if wait is None else wait
+    if workers == 0:
+        logger.info("render pool disabled, rendering inline")
+        return
+
+    _pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm)
+    # at most one job per worker running plus queue_size waiting; callers past
+    # that wait up to _wait seconds for a slot and then get RenderBusy
+    _slots = asyncio.Semaphore(workers + queue_size)
+    logger.info("render pool started with %d workers", workers)
+
+
+def shutdown():
+    global _pool, _slots
+    if _pool is None:
+        return
+    _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _slots = None
+
+
+async def run(fn, *args, **kwargs):
+    if _pool is None:
+        return fn(*args, **kwargs)
+    try:
+        await asyncio.wait_for(_slots.acquire(), _wait)
+    except asyncio.TimeoutError:
+        raise RenderBusy(f"no render slot free after {_wait}s") from None
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_pool, functools.partial(fn, *args, **kwargs))
+    finally:
+        _slots.release()
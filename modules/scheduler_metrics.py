@@ -0,0 +1,233 @@
+import os
+import re
+import asyncio
+import logging
+import functools
+from collections import deque
+from datetime import datetime, timezone
+
+from apscheduler.events import (
+    EVENT_JOB_ADDED,
+    EVENT_JOB_SUBMITTED,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MISSED,
+)
+
+from .helpers import percentile
+
+logger = logging.getLogger(__name__)
+
+# how late jobs start against their scheduled time and how long they run,
+# taken from the scheduler's own events so every job is covered, plus what
+# the reminder fan-out sent. read by /jobstats and the optional metrics port.
+# PTB catches callback exceptions before APScheduler sees them, so errors are
+# counted by the counted() wrapper around each callback instead
+lag_samples = 2000
+
+_job_queue = None
+# returns the reminder slot load, see reminders.slot_summary
+_slot_summary = None
+# job id -> job name; one-shot jobs are gone from the scheduler by the time
+# their run is submitted, so names are taken when jobs are added
+_names = {}
+# job id -> (job name, scheduled time, submitted at) while a run is in flight
+_inflight = {}
+_lags = deque(maxlen=lag_samples)
+_durations = deque(maxlen=lag_samples)
+# job family -> {"runs", "errors", "missed", "lag_s", "duration_s"} (last values)
+_jobs = {}
+# reminder kind -> {"sent", "failed", "catchup", "skipped"}
+_sends = {}
+
+
+def _family(name):
+    # timer_1_16:00 -> timer; named jobs keep their name
+    return re.sub(r"_\d_\d\d:\d\d$", "", name or "unnamed")
+
+
+def _job_stats(name):
+    return _jobs.setdefault(_family(name), {"runs": 0, "errors": 0, "missed": 0, "lag_s": 0.0, "duration_s": 0.0})
+
+
+def _kind_stats(kind):
+    return _sends.setdefault(kind, {"sent": 0, "failed": 0, "catchup": 0, "skipped": 0})
+
+
+def _on_event(event):
+    now = datetime.now(timezone.utc)
+    if event.code == EVENT_JOB_ADDED:
+        job = _job_queue.scheduler.get_job(event.job_id)
+        if job is not None:
+            _names[event.job_id] = job.name
+        return
+
+    name = _names.get(event.job_id)
+    if _job_queue.scheduler.get_job(event.job_id) is None and event.code != EVENT_JOB_SUBMITTED:
+        _names.pop(event.job_id, None)
+    if event.code == EVENT_JOB_SUBMITTED:
+        scheduled = event.scheduled_run_times[-1]
+        _inflight[event.job_id] = (name, scheduled, now)
+        lag = max(0.0, (now - scheduled).total_seconds())
+        _lags.append(lag)
+        _job_stats(name)["lag_s"] = lag
+    elif event.code == EVENT_JOB_MISSED:
+        _job_stats(name)["missed"] += 1
+        logger.warning("job %s missed its run at %s", name, event.scheduled_run_time)
+    else:
+        name, _, submitted = _inflight.pop(event.job_id, (name, None, now))
+        duration = (now - submitted).total_seconds()
+        _durations.append(duration)
+        stats = _job_stats(name)
+        stats["runs"] += 1
+        stats["duration_s"] = duration
+
+
+def install(job_queue, slot_summary=None):
+    global _job_queue, _slot_summary
+    _job_queue = job_queue
+    _slot_summary = slot_summary
+    job_queue.scheduler.add_listener(
+        _on_event, EVENT_JOB_ADDED | EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_MISSED
+    )
+
+
+def counted(callback):
+    # wraps a job callback so an exception is counted before PTB handles it
+    @functools.wraps(callback)
+    async def run(context):
+        try:
+            return await callback(context)
+        except Exception:
+            _job_stats(context.job.name)["errors"] += 1
+            raise
+    return run
+
+
+def record_sends(kind, sent, failed):
+    stats = _kind_stats(kind)
+    stats["sent"] += sent
+    stats["failed"] += failed
+
+
+def record_catchup(kind, sent):
+    _kind_stats(kind)["catchup" if sent else "skipped"] += 1
+
+
+def snapshot(top=10):
+    slots = _slot_summary(top) if _slot_summary else {"timers": 0, "kinds": {}, "hottest": []}
+    return {
+        "jobs": len(_job_queue.jobs()) if _job_queue else 0,
+        "timers": slots["timers"],
+        "inflight": len(_inflight),
+        "lag_s": {
+            "count": len(_lags),
+            "p50": percentile(_lags, 50),
+            "p95": percentile(_lags, 95),
+            "max": max(_lags, default=0.0),
+        },
+        "duration_s": {
+            "p50": percentile(_durations, 50),
+            "p95": percentile(_durations, 95),
+            "max": max(_durations, default=0.0),
+        },
+        "by_job": dict(_jobs),
+        "by_kind": dict(_sends),
+        "slot_kinds": slots["kinds"],
+        "hottest": slots["hottest"],
+    }
+
+
+def build_report():
+    s = snapshot()
+    lag, dur = s["lag_s"], s["duration_s"]
+    lines = [
+        "scheduler",
+        f"  jobs {s['jobs']}  timers {s['timers']}  running now {s['inflight']}",
+        f"  start lag p50 {lag['p50']:.2f}s  p95 {lag['p95']:.2f}s  max {lag['max']:.2f}s  (n={lag['count']})",
+        f"  run time p50 {dur['p50']:.2f}s  p95 {dur['p95']:.2f}s  max {dur['max']:.2f}s",
+        "",
+        "jobs",
+    ]
+    for name, j in sorted(s["by_job"].items()):
+        lines.append(
+            f"  {name:22} runs {j['runs']:5}  errors {j['errors']}  missed {j['missed']}  "
+            f"last lag {j['lag_s']:.2f}s  last run {j['duration_s']:.2f}s"
+        )
+    lines += ["", "reminders"]
+    for kind, k in sorted(s["by_kind"].items()):
+        lines.append(
+            f"  {kind:10} sent {k['sent']:6}  failed {k['failed']}  "
+            f"caught up {k['catchup']}  skipped {k['skipped']}"
+        )
+    for kind, k in sorted(s["slot_kinds"].items()):
+        lines.append(f"  {kind:10} {k['slots']} slots, {k['members']} members")
+    if s["hottest"]:
+        lines += ["", "busiest timers (utc)"]
+        for t in s["hottest"]:
+            lines.append(f"  {t['utc']}  {t['members']} chats in {t['slots']} slots")
+    return "\n".join(lines)
+
+
+def prometheus_text():
+    s = snapshot(top=0)
+    out = [
+        f"bjj_scheduler_jobs {s['jobs']}",
+        f"bjj_scheduler_timers {s['timers']}",
+        f"bjj_scheduler_inflight {s['inflight']}",
+        f"bjj_scheduler_lag_seconds{{quantile=\"0.5\"}} {s['lag_s']['p50']:.3f}",
+        f"bjj_scheduler_lag_seconds{{quantile=\"0.95\"}} {s['lag_s']['p95']:.3f}",
+        f"bjj_scheduler_lag_seconds_max {s['lag_s']['max']:.3f}",
+        f"bjj_scheduler_run_seconds{{quantile=\"0.5\"}} {s['duration_s']['p50']:.3f}",
+        f"bjj_scheduler_run_seconds{{quantile=\"0.95\"}} {s['duration_s']['p95']:.3f}",
+    ]
+    for name, j in sorted(s["by_job"].items()):
+        for field in ("runs", "errors", "missed"):
+            out.append(f"bjj_scheduler_job_{field}_total{{job=\"{name}\"}} {j[field]}")
+        out.append(f"bjj_scheduler_job_last_lag_seconds{{job=\"{name}\"}} {j['lag_s']:.3f}")
+    for kind, k in sorted(s["by_kind"].items()):
+        for field in ("sent", "failed", "catchup", "skipped"):
+            out.append(f"bjj_reminders_{field}_total{{kind=\"{kind}\"}} {k[field]}")
+    for kind, k in sorted(s["slot_kinds"].items()):
+        out.append(f"bjj_reminder_slots{{kind=\"{kind}\"}} {k['slots']}")
+        out.append(f"bjj_reminder_slot_members{{kind=\"{kind}\"}} {k['members']}")
+    return "\n".join(out) + "\n"
+
+
+_server = None
+
+
+async def _handle(reader, writer):
+    try:
+        await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+        body = prometheus_text().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\n".encode()
+            + b"Connection: close\r\n\r\n"
+            + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(port=None, host=None):
+    # plain text metrics on METRICS_PORT (off when unset), local only by default
+    global _server
+    port = port if port is not None else os.getenv("METRICS_PORT")
+    if not port:
+        return
+    host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+    _server = await asyncio.start_server(_handle, host, int(port))
+    logger.info("metrics on http://%s:%s/metrics", host, port)
+
+
+async def stop_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
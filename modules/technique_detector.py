@@ -0,0 +1,147 @@
+import string
+
+from . import technique_index
+
+# everyday names for moves, positions and grips seen in training notes
+common_terms = [
+    "hip escape", "shrimp", "bridge", "technical stand-up", "granby roll",
+    "elbow escape", "trap and roll", "upa",
+    "closed guard", "half guard", "open guard", "butterfly guard",
+    "de la riva", "spider guard", "lasso guard", "x-guard",
+    "single leg x", "rubber guard",
+    "torreando", "toreando", "double under", "knee slice", "knee cut",
+    "leg drag", "smash pass", "over-under", "stack pass",
+    "long step", "body lock pass",
+    "scissor sweep", "flower sweep", "hip bump", "butterfly sweep",
+    "tripod sweep", "pendulum sweep", "sickle sweep",
+    "single leg", "double leg", "hip throw", "ankle pick",
+    "osoto gari", "arm drag", "snap down", "collar drag",
+    "armbar", "triangle", "rear naked choke", "rnc",
+    "guillotine", "kimura", "americana", "omoplata",
+    "ezekiel", "cross choke", "collar choke", "bow and arrow",
+    "arm triangle", "darce", "anaconda", "north-south choke",
+    "loop choke", "baseball choke",
+    "mount", "side control", "back control", "knee on belly",
+    "turtle", "north-south", "crucifix",
+    "seatbelt", "underhook", "overhook", "frames",
+    "collar grip", "sleeve grip",
+]
+
+
+def _catalog_key(term):
+    found = technique_index.alias_table.get(technique_index.normalize(term))
+    # only link on a primary name or synonym, not on context like "(closed guard)"
+    if not found or found[1] < 2.0:
+        return None
+    cat_id, tech_id, _ = technique_index.entries[found[0]]
+    return f"{cat_id}:{tech_id}"
+
+
+# aho-corasick automaton over words instead of characters: word boundaries come
+# for free and a note is walked once, one dict lookup per word. labels are the
+# phrase as the user wrote it; the catalog link lives in key
+patterns = []
+vocabulary = set()
+# every pattern word, plus its plural so "armbars" and "sweeps" still count
+_lookup = {}
+_goto = [{}]
+_fail = [0]
+_out = [[]]
+# ascii notes are split with str.translate, which matches tokenize() on ascii
+# at a fraction of the cost of the regex
+_ascii_spaces = str.maketrans({
+    c: " " for c in map(chr, range(128)) if c not in string.ascii_lowercase + string.digits
+})
+
+
+def _add_pattern(text, label, key):
+    words = technique_index.tokenize(text)
+    if not words:
+        return
+    state = 0
+    for word in words:
+        vocabulary.add(word)
+        nxt = _goto[state].get(word)
+        if nxt is None:
+            nxt = len(_goto)
+            _goto.append({})
+            _fail.append(0)
+            _out.append([])
+            _goto[state][word] = nxt
+        state = nxt
+    if not _out[state]:
+        _out[state].append(len(patterns))
+        patterns.append((len(words), label, key))
+
+
+def _build():
+    for term in common_terms:
+        _add_pattern(term, term.title(), _catalog_key(term))
+
+    # catalog names and synonyms, so "bow and arrow choke" or "mata leao" link too
+    for cat_id, tech_id, tech in technique_index.entries:
+        name = tech.get("name", "").split("(")[0].strip()
+        _add_pattern(name, name.title(), f"{cat_id}:{tech_id}")
+    for alias, key in technique_index.technique_aliases.items():
+        if key in technique_index.by_key:
+            _add_pattern(alias, alias.title(), key)
+
+    queue = list(_goto[0].values())
+    while queue:
+        state = queue.pop(0)
+        for word, nxt in _goto[state].items():
+            queue.append(nxt)
+            f = _fail[state]
+            while f and word not in _goto[f]:
+                f = _fail[f]
+            _fail[nxt] = _goto[f].get(word, 0)
+            _out[nxt] = _out[nxt] + _out[_fail[nxt]]
+
+    _lookup.update({w + "s": w for w in vocabulary})
+    _lookup.update({w: w for w in vocabulary})
+
+
+_build()
+
+
+def _words(text):
+    if text.isascii():
+        return text.lower().translate(_ascii_spaces).split()
+    return technique_index.tokenize(text)
+
+
+def _scan(words):
+    state = 0
+    last = -2
+    hits = [(i, _lookup[w]) for i, w in enumerate(words) if w in _lookup]
+    for i, word in hits:
+        if i != last + 1:
+            state = 0
+        last = i
+        while state and word not in _goto[state]:
+            state = _fail[state]
+        state = _goto[state].get(word, 0)
+        for pid in _out[state]:
+            yield i - patterns[pid][0] + 1, i + 1, pid
+
+
+def detect_techniques(text):
+    words = _words(text)
+    if not words:
+        return []
+
+    matches = sorted(_scan(words), key=lambda m: (m[0], -(m[1] - m[0])))
+    found = []
+    seen = set()
+    taken_until = 0
+    for start, end, pid in matches:
+        if start < taken_until:
+            continue
+        taken_until = end
+        _, label, key = patterns[pid]
+        ident = key or label
+        if ident in seen:
+            continue
+        seen.add(ident)
+        found.append({"label": label, "key": key})
+    return found
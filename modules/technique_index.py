@@ -0,0 +1,228 @@
+import re
+
+from .techniques_data import all_techniques
+
+# common names people use that are not part of the catalog names
+technique_aliases = {
+    "rnc": "submissions:rearnakedchoke",
+    "mata leao": "submissions:rearnakedchoke",
+    "lion killer": "submissions:rearnakedchoke",
+    "shrimp": "escapes:elbowescape",
+    "hip escape": "escapes:elbowescape",
+    "trap and roll": "escapes:bridgeescape",
+    "upa": "escapes:bridgeescape",
+    "bridge and roll": "escapes:bridgeescape",
+    "scarf hold escape": "escapes:kesaescape1",
+    "straight armbar": "submissions:armbarguard",
+    "juji gatame": "submissions:armbarguard",
+    "double wristlock": "submissions:kimura",
+    "keylock": "submissions:americana",
+    "ude garami": "submissions:americana",
+    "foot lock": "submissions:anklelock",
+    "straight ankle lock": "submissions:anklelock",
+    "pendulum sweep": "sweeps:flowersweep",
+    "hip bump": "sweeps:bumpsweep",
+    "bullfighter": "guardpasses:toreando",
+    "torreando": "guardpasses:toreando",
+    "knee slice": "guardpasses:kneecut",
+    "osoto gari": "takedowns:osotogari",
+    "major outer reap": "takedowns:osotogari",
+    "back control": "positions:hooksback",
+    "back take": "positions:hooksback",
+    "kob": "positions:kneeonbelly",
+    "headlock": "selfdefense:neckhold",
+}
+
+min_score = 0.35
+stop_words = {"a", "an", "and", "the", "to", "of", "on", "in", "from", "with", "my", "alt"}
+
+_word_re = re.compile(r"[a-z0-9\u0400-\u04ff]+")
+
+
+def tokenize(text):
+    return _word_re.findall(text.lower())
+
+
+def normalize(text):
+    return " ".join(tokenize(text))
+
+
+def _trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _inner_trigrams(text):
+    # unpadded, so every substring's trigrams are a subset of the text's
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+entries = []
+by_key = {}
+alias_table = {}
+token_postings = {}
+trigram_postings = {}
+# trigram -> aliases containing it, narrows the substring match in search
+alias_trigrams = {}
+category_aliases = {}
+
+
+def _add_alias(alias, idx, weight=2.0):
+    alias = normalize(alias)
+    if not alias or alias in stop_words:
+        return
+    for form in (alias, alias.replace(" ", "")):
+        if form not in alias_table or alias_table[form][1] < weight:
+            alias_table[form] = (idx, weight)
+
+
+def _add_tokens(text, idx):
+    for token in normalize(text).split():
+        if token not in stop_words:
+            token_postings.setdefault(token, set()).add(idx)
+
+
+def _build():
+    for cat_id, cat in all_techniques.items():
+        category_aliases[cat_id] = cat_id
+        category_aliases[normalize(cat["name"])] = cat_id
+        for word in normalize(cat["name"]).split():
+            category_aliases.setdefault(word, cat_id)
+
+        for tech_id, tech in cat.get("items", {}).items():
+            idx = len(entries)
+            name = tech.get("name", "")
+            entries.append((cat_id, tech_id, tech))
+            by_key[f"{cat_id}:{tech_id}"] = idx
+
+            base = name.split("(")[0]
+            _add_alias(name, idx)
+            _add_alias(base, idx)
+            _add_alias(tech_id, idx)
+            # parentheses hold either another name ("upa") or context ("from mount")
+            for inner in re.findall(r"\(([^)]*)\)", name):
+                for piece in inner.split(","):
+                    if not piece.strip().startswith("from "):
+                        _add_alias(piece, idx, weight=1.2)
+
+            _add_tokens(name, idx)
+            _add_tokens(tech_id, idx)
+
+    for alias, key in technique_aliases.items():
+        idx = by_key.get(key)
+        if idx is None:
+            continue
+        _add_alias(alias, idx)
+        _add_tokens(alias, idx)
+
+    for token in token_postings:
+        for gram in _trigrams(token):
+            trigram_postings.setdefault(gram, set()).add(token)
+    for alias in alias_table:
+        for gram in _inner_trigrams(alias):
+            alias_trigrams.setdefault(gram, set()).add(alias)
+
+
+_build()
+
+
+def _similar_tokens(token):
+    if token in token_postings:
+        yield token, 1.0
+    grams = _trigrams(token)
+    counts = {}
+    for gram in grams:
+        for candidate in trigram_postings.get(gram, ()):
+            counts[candidate] = counts.get(candidate, 0) + 1
+    for candidate, shared in counts.items():
+        if candidate == token:
+            continue
+        if len(token) >= 3 and candidate.startswith(token):
+            yield candidate, 0.85
+            continue
+        sim = 2 * shared / (len(grams) + len(_trigrams(candidate)))
+        if sim >= 0.45:
+            yield candidate, sim * 0.8
+
+
+def search(query, limit=10, category=None):
+    q = normalize(query)
+    if not q:
+        return []
+
+    scores = {}
+    exact = alias_table.get(q) or alias_table.get(q.replace(" ", ""))
+    if exact:
+        scores[exact[0]] = exact[1]
+
+    tokens = [t for t in q.split() if t not in stop_words] or q.split()
+    for token in tokens:
+        best = {}
+        for candidate, weight in _similar_tokens(token):
+            for idx in token_postings.get(candidate, ()):
+                if weight > best.get(idx, 0):
+                    best[idx] = weight
+        for idx, weight in best.items():
+            scores[idx] = scores.get(idx, 0) + weight / len(tokens)
+
+    compact = q.replace(" ", "")
+    if len(compact) >= 4:
+        postings = sorted((alias_trigrams.get(g, set()) for g in _inner_trigrams(compact)), key=len)
+        candidates = set.intersection(*postings)
+        for alias in candidates:
+            if compact in alias:
+                idx = alias_table[alias][0]
+                scores[idx] = max(scores.get(idx, 0), 0.9)
+
+    ranked = []
+    for idx, score in scores.items():
+        if score < min_score:
+            continue
+        cat_id, tech_id, tech = entries[idx]
+        if category and cat_id != category:
+            continue
+        ranked.append((round(score, 3), cat_id, tech_id, tech, idx))
+    ranked.sort(key=lambda r: (-r[0], len(r[3].get("name", "")), r[4]))
+    return [r[:4] for r in ranked[:limit]]
+
+
+def resolve(query, category=None):
+    found = search(query, limit=1, category=category)
+    if not found:
+        return None
+    _, cat_id, tech_id, tech = found[0]
+    return cat_id, tech_id, tech
+
+
+def resolve_category(text):
+    t = normalize(text)
+    if not t:
+        return None
+    if t in category_aliases:
+        return category_aliases[t]
+    compact = t.replace(" ", "")
+    # one or two letters would match half the category names
+    if len(compact) < 3:
+        return None
+    for alias, cat_id in category_aliases.items():
+        alias = alias.replace(" ", "")
+        if compact in alias or (len(alias) >= 3 and alias in compact):
+            return cat_id
+    return None
+
+
+def lookup_key(key):
+    key = key.strip()
+    idx = by_key.get(key)
+    if idx is not None:
+        return entries[idx]
+    if ":" not in key:
+        return None
+    cat_text, tech_text = key.split(":", 1)
+    cat_id = resolve_category(cat_text)
+    if not cat_id:
+        return None
+    idx = by_key.get(f"{cat_id}:{tech_text.strip()}")
+    if idx is not None:
+        return entries[idx]
+    return resolve(tech_text, category=cat_id)
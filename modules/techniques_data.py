@@ -418,3 +418,71 @@ all_techniques = {
         }
     },
 }
+
+# bit position of every technique in a user's toolbox bitset.
+# append new techniques at the end, never reorder or remove entries.
+technique_bits = [
+    "escapes:elbowescape",
+    "escapes:bridgeescape",
+    "escapes:backescape",
+    "escapes:guardrecovery",
+    "escapes:kobescape",
+    "escapes:halfguardescape",
+    "escapes:kesaescape1",
+    "escapes:kesaescape2",
+    "escapes:mountescape",
+    "escapes:armbarescape",
+    "escapes:triangleescape",
+    "escapes:gripbreak",
+    "submissions:rearnakedchoke",
+    "submissions:lapelchoke",
+    "submissions:ezekiel",
+    "submissions:americanamount",
+    "submissions:armbarguard",
+    "submissions:triangle",
+    "submissions:kimura",
+    "submissions:americana",
+    "submissions:armbardetails",
+    "submissions:crosschokemount",
+    "submissions:armbarback",
+    "submissions:bowandarrow",
+    "submissions:crosschokeguard",
+    "submissions:armbarknee",
+    "submissions:omoplata",
+    "submissions:guillotine",
+    "submissions:anklelock",
+    "sweeps:tripodsweep",
+    "sweeps:scissorsweep",
+    "sweeps:bumpsweep",
+    "sweeps:doubleankle",
+    "sweeps:waitersweep",
+    "sweeps:flowersweep",
+    "sweeps:butterflysweep",
+    "guardpasses:overunder",
+    "guardpasses:supermanpass",
+    "guardpasses:toreando",
+    "guardpasses:legdrag",
+    "guardpasses:kneecut",
+    "guardpasses:guardbreak",
+    "guardpasses:guardbreakstand",
+    "takedowns:osotogari",
+    "takedowns:singleleg",
+    "takedowns:guardpull",
+    "takedowns:doubleleg",
+    "takedowns:sprawl",
+    "takedowns:safeclinch",
+    "takedowns:clinchhookleg",
+    "positions:sidetomount",
+    "positions:kneeonbelly",
+    "positions:hooksback",
+    "ukemi:forwardroll",
+    "ukemi:backwardroll",
+    "ukemi:forwardbreakfall",
+    "ukemi:backwardbreakfall",
+    "ukemi:sidebreakfall",
+    "selfdefense:neckhold",
+    "selfdefense:bearhug",
+    "selfdefense:reargrab",
+    "selfdefense:punchblocklong",
+    "selfdefense:punchblockclose",
+]
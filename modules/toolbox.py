@@ -0,0 +1,126 @@
+from .database import load_database
+from .techniques_data import all_techniques, technique_bits
+from .helpers import now_se
+
+# the toolbox is stored as a hex bitset over technique_bits plus a side table
+# of added_at timestamps keyed by bit position
+bit_of = {key: i for i, key in enumerate(technique_bits)}
+category_masks = {}
+
+for _cat_id, _cat in all_techniques.items():
+    _mask = 0
+    for _tech_id in _cat["items"]:
+        _key = f"{_cat_id}:{_tech_id}"
+        if _key not in bit_of:
+            # forgotten in technique_bits; still usable, but add it there so the bit stays put
+            bit_of[_key] = len(technique_bits)
+            technique_bits.append(_key)
+        _mask |= 1 << bit_of[_key]
+    category_masks[_cat_id] = _mask
+
+# chat_id -> toolbox bitset, so browsing the library does not reload the user
+# file on every tap. add_technique and remove_technique only change db; the
+# caller refreshes the cache once the save went through
+_membership = {}
+
+
+def toolbox_key(cat_id, tech_id):
+    return f"{cat_id}:{tech_id}"
+
+
+def _migrate(db):
+    # older user files and backups keep a list of {key, name, category, added_at}
+    legacy = db.pop("toolbox", None)
+    mask = int(db.get("toolbox_bits") or "0", 16)
+    added = db.setdefault("toolbox_added", {})
+    for entry in legacy or []:
+        bit = bit_of.get(entry.get("key", ""))
+        if bit is None:
+            continue
+        mask |= 1 << bit
+        added.setdefault(str(bit), entry.get("added_at", ""))
+    db["toolbox_bits"] = format(mask, "x")
+    return mask
+
+
+def toolbox_mask(db):
+    if "toolbox" in db:
+        return _migrate(db)
+    return int(db.get("toolbox_bits") or "0", 16)
+
+
+def _store(db, mask):
+    db["toolbox_bits"] = format(mask, "x")
+
+
+def is_known(mask, key):
+    bit = bit_of.get(key)
+    return bit is not None and (mask >> bit) & 1 == 1
+
+
+def category_count(mask, cat_id):
+    return (mask & category_masks.get(cat_id, 0)).bit_count()
+
+
+def toolbox_count(db):
+    return toolbox_mask(db).bit_count()
+
+
+def total_techniques():
+    return len(bit_of)
+
+
+def toolbox_entries(db):
+    mask = toolbox_mask(db)
+    added = db.get("toolbox_added", {})
+    entries = []
+    for cat_id, cat in all_techniques.items():
+        for tech_id, tech in cat["items"].items():
+            key = f"{cat_id}:{tech_id}"
+            bit = bit_of[key]
+            if (mask >> bit) & 1:
+                entries.append({
+                    "key": key,
+                    "name": tech["name"],
+                    "category": cat["name"],
+                    "added_at": added.get(str(bit), ""),
+                })
+    entries.sort(key=lambda e: e["added_at"])
+    return entries
+
+
+def refresh(chat_id, db):
+    mask = toolbox_mask(db)
+    _membership[chat_id] = mask
+    return mask
+
+
+def forget(chat_id):
+    _membership.pop(chat_id, None)
+
+
+def known_mask(chat_id, db=None):
+    mask = _membership.get(chat_id)
+    if mask is None:
+        mask = refresh(chat_id, db if db is not None else load_database(chat_id))
+    return mask
+
+
+def add_technique(db, key):
+    bit = bit_of.get(key)
+    mask = toolbox_mask(db)
+    if bit is None or (mask >> bit) & 1:
+        return False
+    mask |= 1 << bit
+    _store(db, mask)
+    db.setdefault("toolbox_added", {})[str(bit)] = now_se().isoformat()
+    return True
+
+
+def remove_technique(db, key):
+    bit = bit_of.get(key)
+    mask = toolbox_mask(db)
+    if bit is not None:
+        mask &= ~(1 << bit)
+        db.get("toolbox_added", {}).pop(str(bit), None)
+    _store(db, mask)
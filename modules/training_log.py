@@ -0,0 +1,28 @@
+from . import user_stats
+
+# daily check-ins live in db["training_log"] as {"date", "trained"} entries in
+# date order. a new day is appended and counted in user_stats as it comes in;
+# an answer for an older day, or a changed answer, rebuilds the stats
+
+
+def record_checkin(db, day, trained):
+    # returns False when the answer is already logged
+    log = db.setdefault("training_log", [])
+    if not log or log[-1]["date"] < day:
+        log.append({"date": day, "trained": trained})
+        user_stats.checkin_added(db, day, trained)
+        return True
+
+    for i in range(len(log) - 1, -1, -1):
+        if log[i]["date"] == day:
+            if log[i]["trained"] == trained:
+                return False
+            log[i]["trained"] = trained
+            break
+        if log[i]["date"] < day:
+            log.insert(i + 1, {"date": day, "trained": trained})
+            break
+    else:
+        log.insert(0, {"date": day, "trained": trained})
+    user_stats.rebuild(db)
+    return True
@@ -0,0 +1,167 @@
+from datetime import date, timedelta
+
+# running totals for /stats, the menu and the ai context, kept in db["stats"]
+# and updated by whoever changes notes, goals or the training log, after the
+# change. per-day counters only cover the last window_days, which is all the
+# week and month figures need. anything unusual (an import, an answer for an
+# older day) rebuilds the whole thing from the data
+stats_version = 1
+window_days = 31
+
+
+def _empty():
+    return {
+        "version": stats_version,
+        "notes": 0,
+        "first_note": None,
+        "notes_by_day": {},
+        "checkins": 0,
+        "trained": 0,
+        "trained_by_day": {},
+        "last_trained": None,
+        "streak_len": 0,
+        "goals": {"active": 0, "completed": 0},
+    }
+
+
+def _bump(counter, day, delta):
+    count = counter.get(day, 0) + delta
+    if count > 0:
+        counter[day] = count
+    else:
+        counter.pop(day, None)
+    if len(counter) > window_days + 1:
+        cutoff = (date.fromisoformat(max(counter)) - timedelta(days=window_days)).isoformat()
+        for old in [d for d in counter if d < cutoff]:
+            del counter[old]
+
+
+def _add_note(stats, note):
+    day = note.get("date")
+    stats["notes"] += 1
+    if day:
+        _bump(stats["notes_by_day"], day, 1)
+        if stats["first_note"] is None or day < stats["first_note"]:
+            stats["first_note"] = day
+
+
+def _add_checkin(stats, day, trained):
+    stats["checkins"] += 1
+    if not trained:
+        return
+    stats["trained"] += 1
+    _bump(stats["trained_by_day"], day, 1)
+    last = stats["last_trained"]
+    if last is not None and date.fromisoformat(day) - date.fromisoformat(last) == timedelta(days=1):
+        stats["streak_len"] += 1
+    elif last != day:
+        stats["streak_len"] = 1
+    stats["last_trained"] = day
+
+
+def _goal_bucket(status):
+    status = status or "active"
+    return status if status in ("active", "completed") else None
+
+
+def rebuild(db):
+    db.pop("training_stats", None)
+    stats = _empty()
+    for note in db.get("notes", []):
+        _add_note(stats, note)
+    log = db.setdefault("training_log", [])
+    log.sort(key=lambda e: e.get("date", ""))
+    for entry in log:
+        _add_checkin(stats, entry["date"], entry.get("trained"))
+    for goal in db.get("goals", []):
+        bucket = _goal_bucket(goal.get("status"))
+        if bucket:
+            stats["goals"][bucket] += 1
+    db["stats"] = stats
+    return stats
+
+
+def _current(db):
+    stats = db.get("stats")
+    if stats is None or stats.get("version") != stats_version:
+        return None
+    return stats
+
+
+def stale(db):
+    return _current(db) is None
+
+
+def get(db):
+    return _current(db) or rebuild(db)
+
+
+def note_added(db, note):
+    stats = _current(db)
+    if stats is None:
+        rebuild(db)
+        return
+    _add_note(stats, note)
+
+
+def note_removed(db, note):
+    stats = _current(db)
+    if stats is None:
+        rebuild(db)
+        return
+    day = note.get("date")
+    stats["notes"] -= 1
+    if day:
+        _bump(stats["notes_by_day"], day, -1)
+        if day == stats["first_note"]:
+            stats["first_note"] = min((n["date"] for n in db.get("notes", []) if n.get("date")), default=None)
+
+
+def checkin_added(db, day, trained):
+    # only for a day after every logged one; anything else goes through rebuild
+    stats = _current(db)
+    if stats is None:
+        rebuild(db)
+        return
+    _add_checkin(stats, day, trained)
+
+
+def goal_changed(db, old_status, new_status):
+    # old_status is None for a new goal
+    stats = _current(db)
+    if stats is None:
+        rebuild(db)
+        return
+    if old_status is not None and _goal_bucket(old_status):
+        stats["goals"][_goal_bucket(old_status)] -= 1
+    if _goal_bucket(new_status):
+        stats["goals"][_goal_bucket(new_status)] += 1
+
+
+def _since(counter, today, days):
+    cutoff = (date.fromisoformat(today) - timedelta(days=days)).isoformat()
+    return sum(n for d, n in counter.items() if cutoff <= d <= today)
+
+
+def streak(db, today):
+    # trained days in a row ending today, 0 if today has no trained check-in
+    stats = get(db)
+    return stats["streak_len"] if stats["last_trained"] == today else 0
+
+
+def summary(db, today):
+    stats = get(db)
+    return {
+        "notes": stats["notes"],
+        "notes_week": _since(stats["notes_by_day"], today, 7),
+        "first_note": stats["first_note"],
+        "checkins": stats["checkins"],
+        "trained": stats["trained"],
+        "rest": stats["checkins"] - stats["trained"],
+        "trained_week": _since(stats["trained_by_day"], today, 7),
+        "trained_month": _since(stats["trained_by_day"], today, 30),
+        "last_trained": stats["last_trained"],
+        "streak": streak(db, today),
+        "active_goals": stats["goals"]["active"],
+        "completed_goals": stats["goals"]["completed"],
+    }